@@ -1,5 +1,6 @@
 # -*- coding:utf-8 -*-
 
+import os
 import redis
 
 
@@ -21,6 +22,29 @@ class Config:
     SESSION_REDIS = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT)  # 保存session数据的redis配置
     PERMANENT_SESSION_LIFETIME = 86400  # session数据的有效期秒
 
+    # 图片异步上传使用的参数
+    IMAGE_UPLOAD_SPOOL_DIR = "spool/images"  # 上传完成前图片的本地暂存目录，相对路径位于app的instance目录中
+    IMAGE_UPLOAD_WORKERS = 4  # 每个进程中的后台上传线程数
+    IMAGE_UPLOAD_RETRIES = 3  # 上传失败后的重试次数
+
+    # 图片存储后端，qiniu：七牛云存储，local：本地磁盘
+    STORAGE_BACKEND = "qiniu"
+    LOCAL_STORAGE_DIR = "media"  # 本地磁盘存储的目录
+    LOCAL_STORAGE_URL_PREFIX = "/api/v1.0/images/"  # 本地磁盘存储的图片访问地址前缀
+    LOCAL_STORAGE_ACCEL_REDIRECT = None  # 由nginx发送图片时，对应存储目录的internal location，例如 "/media/"
+
+    # 图片验证码使用HMAC签名的令牌（通过cookie返回）保存验证码内容，不再写入redis
+    CAPTCHA_TOKEN_MODE = False
+
+    # 短信发送进程使用的发送方式，ccp：云通讯，log：只记录日志（开发测试使用）
+    SMS_SENDER = "ccp"
+
+    # 房东订单汇总通知的发送方式，sms：通过短信发送队列发送，log：只记录日志（开发测试使用）
+    # 云通讯中还没有汇总通知的短信模板，先只记录日志，模板审核通过并设置ORDER_DIGEST_SMS_TEMPLATE_ID后再改为sms
+    ORDER_NOTIFY_SINK = "log"
+    # 房东订单汇总通知的云通讯短信模板编号，模板参数为新订单数和新评价数，不能使用短信验证码的模板
+    ORDER_DIGEST_SMS_TEMPLATE_ID = None
+
 
 class DevelopmentConfig(Config):
     """开发模式的配置参数"""
@@ -32,7 +56,15 @@ class ProductionConfig(Config):
     pass
 
 
+class TestingConfig(Config):
+    """单元测试的配置参数，默认使用内存中的sqlite数据库，可以通过环境变量IHOME_TEST_DATABASE_URI指定单独的测试数据库"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get("IHOME_TEST_DATABASE_URI", "sqlite://")
+    WTF_CSRF_ENABLED = False
+
+
 config = {
     "development": DevelopmentConfig,  # 开发模式
-    "production": ProductionConfig  # 生产/线上模式
+    "production": ProductionConfig,  # 生产/线上模式
+    "testing": TestingConfig  # 单元测试
 }
\ No newline at end of file
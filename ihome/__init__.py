@@ -1,6 +1,8 @@
 # -*- coding:utf-8 -*-
 import logging
 import redis
+# python2的datetime.strptime在第一次调用时才导入_strptime模块，多个线程同时第一次调用会出错，提前导入
+import _strptime
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
@@ -48,6 +50,12 @@ def create_app(config_name):
     # 数据库处理
     db.init_app(app)
 
+    # 图片存储后端与异步上传
+    from .utils.image_storage import init_storage
+    init_storage(app)
+    from .utils.image_upload import image_uploader
+    image_uploader.init_app(app)
+
     # 为app添加api蓝图应用
     from .api_1_0 import api as api_1_0_blueprint
     app.register_blueprint(api_1_0_blueprint, url_prefix="/api/v1.0")
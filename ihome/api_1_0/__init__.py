@@ -4,13 +4,14 @@ from flask import Blueprint
 
 api = Blueprint('api', __name__)
 
-from . import passport, profile, verifycode, house, orders
+from . import passport, profile, verifycode, house, orders, uploads
 
 
 @api.after_request
 def after_request(response):
     """设置默认的响应报文格式为application/json"""
-    # 如果响应报文response的Content-Type是以text开头，则将其改为默认的json类型
-    if response.headers.get("Content-Type").startswith("text"):
+    # 如果响应报文response的Content-Type是以text开头，则将其改为默认的json类型，订单推送的事件流除外
+    content_type = response.headers.get("Content-Type")
+    if content_type.startswith("text") and not content_type.startswith("text/event-stream"):
         response.headers["Content-Type"] = "application/json"
     return response
@@ -3,12 +3,17 @@
 import json
 import datetime
 
-from flask import current_app, request, jsonify, g, session
-from ihome import db, redis_store, constants
+from sqlalchemy import and_, or_
+
+from flask import current_app, request, jsonify, g, session, url_for
+from ihome import db, constants
 from ihome.utils.response_code import RET
-from ihome.utils.commons import login_required
-from ihome.utils.image_storage import storage
-from ihome.models import Area, House, Facility, HouseImage, User, Order
+from ihome.utils.commons import login_required, encode_cursor, decode_cursor
+from ihome.utils.image_upload import image_uploader, UPLOAD_PENDING
+from ihome.utils import availability, house_rank
+from ihome.utils.cache import get_houses_list_key, bump_houses_area, read_through, read_through_entry, read_local, \
+    make_etag, make_cached_response
+from ihome.models import Area, House, Facility, HouseImage, User, Order, HouseSearch, house_facility
 from . import api
 #获取城区信息
 @api.route("/areas", methods=["GET"])
@@ -19,37 +24,24 @@ def get_areas_info():
     3、查询数据库
     4、返回结果
     """
-    #查询缓存数据库，获取城区信息
-    try:
-        areas = redis_store.get("area_info")
-    except Exception as e:
-        current_app.logger.error(e)
-        areas = None
-    #如果获取到城区信息，把数据返回给前端
-    if areas:
-        current_app.logger.info("hit area info redis")
-        #由于缓存中存储的城区数据，格式为json字符串，所以可以直接返回给前端
-        return '{"errno":0, "errmsg":"OK", "data":%s}' % areas
-    #如果没有获取到城区数据，需要查询mysql数据库
-    try:
+    def load_areas():
+        """查询mysql数据库，生成完整的城区信息响应报文"""
         areas = Area.query.all()
-    except Exception as e:
-        current_app.logger.error(e)
-        #如果查询数据发生异常，返回错误信息给前端
-        return jsonify(errno=RET.DBERR, errmsg="获取城区信息失败") 
-    #定义列表，用来存储mysql数据中查询到的城区信息数据，并把数据转换成json字符串，返回前端
-    areas_list = []
-    for area in areas:
-        areas_list.append(area.to_dict())
-    json_areas = json.dumps(areas_list)
-    #把查询结果，添加到缓存数据库中
+        #定义列表，用来存储mysql数据中查询到的城区信息数据，并把数据转换成json字符串
+        areas_list = []
+        for area in areas:
+            areas_list.append(area.to_dict())
+        return '{"errno":"0", "errmsg":"OK", "data":%s}' % json.dumps(areas_list)
+    #城区信息几乎不会变化，先读取进程内缓存，再读取redis缓存，缓存不存在或过期时才查询mysql数据库
     try:
-        redis_store.setex("area_info", constants.AREA_INFO_REDIS_EXPIRES, json_areas)
+        body, etag = read_local("area_info_resp", lambda: read_through_entry(
+            "area_info_resp", constants.AREA_INFO_REDIS_EXPIRES, load_areas))
     except Exception as e:
         current_app.logger.error(e)
-    #返回前端城区信息数据
-    resp = '{"errno":"0", "errmsg":"OK", "data":%s}' % json_areas
-    return resp
+        #如果查询数据发生异常，返回错误信息给前端
+        return jsonify(errno=RET.DBERR, errmsg="获取城区信息失败")
+    #缓存中存储的是完整的响应报文，可以直接返回给前端
+    return make_cached_response(body, etag)
 
 @api.route("/houses", methods=["POST"])
 @login_required
@@ -126,19 +118,39 @@ def save_new_house():
 
     #获取设施信息
     facility = house_data.get("facility")
+    facility_ids = []
     if facility:
-        #过滤设施信息，只存储数据库中定义的设施信息
-        facilities = Facility.query.filter(Facility.id.in_(facility)).all()
-        house.facilities = facilities
+        #过滤设施信息，只存储数据库中定义的设施信息，设施编号从进程内缓存中获取，不再查询数据库
+        try:
+            all_facility_ids = get_facility_ids()
+        except Exception as e:
+            current_app.logger.error(e)
+            return jsonify(errno=RET.DBERR, errmsg="获取设施信息失败")
+        for facility_id in facility:
+            try:
+                facility_id = int(facility_id)
+            except Exception as e:
+                continue
+            if facility_id in all_facility_ids and facility_id not in facility_ids:
+                facility_ids.append(facility_id)
     #把数据存入到数据库中
     try:
         db.session.add(house)
+        #直接向房屋设施关系表插入数据，不需要先查询出设施对象
+        if facility_ids:
+            db.session.flush()
+            db.session.execute(house_facility.insert(),
+                               [{"house_id": house.id, "facility_id": facility_id} for facility_id in facility_ids])
+        #同步写入房屋搜索表
+        HouseSearch.refresh(house)
         db.session.commit()
     except Exception as e:
         current_app.logger.error(e)
         #如果存入数据失败，进行回滚操作
         db.session.rollback()
         return jsonify(errno=RET.DBERR, errmsg="保存房屋数据失败")
+    #新发布的房屋使房屋列表缓存失效
+    bump_houses_area(house.area_id)
     #返回前端正确的响应数据
     return jsonify(errno=RET.OK, errmsg="OK", data={"house_id": house.id})
 
@@ -164,39 +176,57 @@ def save_house_image(house_id):
     except Exception as e:
         current_app.logger.error(e)
         return jsonify(errno=RET.DATAERR, errmsg="房屋不存在")
-    #读取图片文件
+    if house is None:
+        return jsonify(errno=RET.NODATA, errmsg="房屋不存在")
+    #读取图片文件，写入本地暂存目录后由后台线程上传到存储后端，上传完成后保存房屋图片
     image_data = image.read()
-    #调用第三方七牛云接口，获取图片路径（图片名称）
     try:
-        image_name = storage(image_data)
+        upload_id = image_uploader.submit("house_image", house_id, image_data)
     except Exception as e:
         current_app.logger.error(e)
-        return jsonify(errno=RET.THIRDERR, errmsg="上传图片失败")
+        return jsonify(errno=RET.IOERR, errmsg="保存图片失败")
+    #上传完成前，图片地址返回暂存图片的预览地址
+    img_url = url_for("api.get_upload_image", upload_id=upload_id)
+    return jsonify(errno=RET.OK, errmsg="OK", data={"url": img_url, "upload_id": upload_id,
+                                                    "status": UPLOAD_PENDING})
+
+
+def save_house_image_name(image_name, house_id):
+    """图片上传到存储后端后，在后台线程中保存房屋图片，房屋没有主图片时设置为主图片"""
+    house = House.query.get(house_id)
+    if house is None:
+        return
     #把图片名称临时加入到数据库的session对象中
     house_image = HouseImage()
     house_image.house_id = house_id
     house_image.url = image_name
     db.session.add(house_image)
     #设施房屋的主图片信息
-    if not house.index_image_url:
+    index_image_changed = not house.index_image_url
+    if index_image_changed:
         house.index_image_url = image_name
         db.session.add(house)
-    #把图片数据存入数据库
+    #把图片数据存入数据库，主图片变化时同步更新房屋搜索表
     try:
+        if index_image_changed:
+            HouseSearch.refresh(house)
         db.session.commit()
-    except Exception as e:
-        current_app.logger.error(e)
+    except Exception:
         db.session.rollback()
-        return jsonify(errno=RET.DBERR, errmsg="保存房屋图片失败")
-    #拼接房屋图片的url，并且把响应数据返回给前端
-    img_url = constants.QINIU_DOMIN_PREFIX + image_name
-    return jsonify(errno=RET.OK, errmsg="OK", data={"url": img_url})
+        raise
+    #房屋列表中展示的是房屋主图片，主图片变化后使房屋列表缓存失效，有主图片的房屋才能进入首页排行
+    if index_image_changed:
+        bump_houses_area(house.area_id)
+        house_rank.update_house_rank(house)
+
+
+image_uploader.register_handler("house_image", save_house_image_name)
 
 
 @api.route("/user/houses", methods=["GET"])
 @login_required
 def get_user_houses():
-     """
+    """
     获取用户房源列表
     1、接收参数
     2、校验参数
@@ -207,17 +237,12 @@ def get_user_houses():
     user_id = g.user_id
     # 根据用户编号，查询数据库中存储的房屋数据
     try:
-        user = User.query.get(user_id)
-        houses = user.houses
+        houses = House.query.filter(House.user_id == user_id).all()
+        #调用了房屋模型类的批量序列化数据的方法to_basic_dict_list()
+        houses_list = House.to_basic_dict_list(houses)
     except Exception as e:
         current_app.logger.error(e)
         return jsonify(errno=RET.DBERR, errmsg="获取数据失败")
-    #把查询结果存储到列表中，
-    houses_list = []
-    if houses:
-        for house in houses:
-            #调用了房屋模型类的序列化数据的方法to_basic_dict()
-            houses_list.append(house.to_basic_dict())
     #把房屋列表信息返回给前端
     return jsonify(errno=RET.OK, errmsg="OK", data={"houses": houses_list})
 
@@ -226,43 +251,29 @@ def get_user_houses():
 @api.route("/houses/index", methods=["GET"])
 def get_house_index():
     """项目首页信息展示"""
-    #尝试从缓存数据库中获取房源信息
+    def load_index_houses():
+        """默认展示五条成交量最高的房源信息，按倒叙排列，生成完整的响应报文，没有房屋时返回None，不进行缓存"""
+        #从redis的房屋排行中获取成交量最高、并且有主图片的房屋编号，再根据编号查询mysql数据库
+        house_ids = house_rank.get_top_house_ids(constants.HOME_PAGE_MAX_HOUSES)
+        if not house_ids:
+            return None
+        houses = House.query.filter(House.id.in_(house_ids)).all()
+        houses.sort(key=lambda house: house_ids.index(house.id))
+        #序列化数据调用了模型类中的to_basic_dict_list()方法
+        houses_list = House.to_basic_dict_list(houses)
+        return '{"errno":0, "errmsg":"OK", "data":%s}' % json.dumps(houses_list)
+    #通过缓存数据库获取房源信息，缓存不存在或过期时才查询mysql数据库
     try:
-        ret = redis_store.get("home_page_data")
+        entry = read_through_entry(house_rank.HOME_PAGE_RESP_KEY, constants.HOME_PAGE_DATA_REDIS_EXPIRES,
+                                   load_index_houses)
     except Exception as e:
         current_app.logger.error(e)
-        ret = None
-    #如果获取到房源信息数据，记录下日志，便于查看房源信息的过期时间
-    if ret:
-        current_app.logger.info("hit house index info redis")
-        return '{"errno":0, "errmsg":"OK", "data":%s}' % ret
-    #如果缓存中没有数据，需要查询mysql数据库，默认展示五条成交量最高的房源信息，按倒叙排列
-    else:
-        try:
-            houses = House.query.order_by(House.order_count.desc()).limit(constants.HOME_PAGE_MAX_HOUSES)
-        except Exception as e:
-            current_app.logger.error(e)
-            return jsonify(errno=RET.DBERR, errmsg="查询数据失败")
-        #校验查询结果
-        if not houses:
-            return jsonify(errno=RET.NODATA, errmsg="查询无数据")
-        #定义一个列表用来存储查询到数据
-        houses_list = []
-        for house in houses:
-            #如果房源信息里，没有房源图片信息
-            if not house.index_image_url:
-                continue
-            #把遍历的结果添加到列表中，序列化数据调用了模型类中的to_basic_dict()方法
-            houses_list.append(house.to_basic_dict())
-        #转换成json
-        json_houses = json.dumps(houses_list)
-        #把响应数据先存储到缓存数据库中
-        try:
-            redis_store.setex("home_page_data", constants.HOME_PAGE_DATA_REDIS_EXPIRES, json_houses)
-        except Exception as e:
-            current_app.logger.error(e)
-        #返回响应数据给前端
-        return '{"errno":0, "errmsg":"OK", "data":%s}' % json_houses
+        return jsonify(errno=RET.DBERR, errmsg="查询数据失败")
+    #校验查询结果
+    if not entry:
+        return jsonify(errno=RET.NODATA, errmsg="查询无数据")
+    #返回缓存中的响应报文给前端
+    return make_cached_response(*entry)
 
 
 @api.route("/houses/<int:house_id>", methods=["GET"])
@@ -274,41 +285,26 @@ def get_house_detail(house_id):
     #校验房屋id
     if not house_id:
         return jsonify(errno=RET.PARAMERR, errmsg="参数缺失")
-    #尝试从redis缓存数据库中，根据房屋id获取房屋信息
-    try:
-        ret = redis_store.get("house_info_%s" % house_id)
-    except Exception as e:
-        current_app.logger.error(e)
-        ret = None
-    #如果获取到房屋信息数据
-    if ret:
-        current_app.logger.info("hit house info redis")
-        return '{"errno":"0", "errmsg":"OK", "data":{"user_id":%s, "house":%s}}' % (user_id, ret)
-    #如果缓存中没有获取到数据，查询mysql数据库
-    try:
+    def load_house():
+        """查询mysql数据库，调用了模型类中的to_full_dict()方法，把详细的房屋信息转成json，房屋不存在时返回None"""
         house = House.query.get(house_id)
+        if not house:
+            return None
+        return json.dumps(house.to_full_dict())
+    #通过redis缓存数据库，根据房屋id获取房屋信息，缓存不存在或过期时才查询mysql数据库
+    try:
+        entry = read_through_entry("house_info_%s" % house_id, constants.HOUSE_DETAIL_REDIS_EXPIRE_SECOND, load_house)
     except Exception as e:
         current_app.logger.error(e)
-        #如果数据库中，没有具体的房屋信息，需要终止视图函数的执行
         return jsonify(errno=RET.DBERR, errmsg="查询数据失败")
-    #校验参数是否存在
-    if not house:
+    #校验查询结果，房屋不存在，需要终止视图函数的执行
+    if entry is None:
         return jsonify(errno=RET.NODATA, errmsg="房屋不存在")
-    #如果房屋信息已经获取，调用了模型类中的to_full_dict()方法，用来展示详细的房屋信息
-    try:
-        house_data = house.to_full_dict()
-    except Exception as e:
-        current_app.logger.error(e)
-        return jsonify(errno=RET.DATAERR, errmsg="数据出错")
-    #把序列化后的数据，转成json，先把数据缓存到redis中，然后返回给前端
-    json_house = json.dumps(house_data)
-    try:
-        redis_store.setex("house_info_%s" % house_id, constants.HOUSE_DETAIL_REDIS_EXPIRE_SECOND, json_house)
-    except Exception as e:
-        current_app.logger.error(e)
+    #缓存中只保存与用户无关的房屋信息，响应报文中只有user_id随用户变化，ETag中同样带上user_id
+    json_house, house_etag = entry
     resp = '{"errno":"0", "errmsg":"OK", "data":{"user_id":%s, "house":%s}}' % (user_id, json_house)
     #把响应数据返回给前端
-    return resp
+    return make_cached_response(resp, "%s-%s" % (house_etag, user_id))
 
 
 @api.route("/houses", methods=["GET"])
@@ -341,81 +337,152 @@ def get_houses_list():
     except Exception as e:
         current_app.logger.error(e)
         return jsonify(errno=RET.PARAMERR, errmsg="页数格式不正确")
-    #尝试获取数据，从redis缓存中获取房源信息数据，使用的数据为哈希类型
+    #游标分页模式，请求中携带参数c时启用（c为空表示第一页），每页只进行一次索引范围查询，不使用OFFSET
+    cursor = request.args.get("c")
+    if cursor is not None:
+        return get_houses_by_cursor(area_id, start_date, end_date, sort_key, cursor)
+    #生成缓存键，缓存键中带有搜索条件对应的版本号和页数
     try:
-        redis_key = "houses_%s_%s_%s_%s" % (area_id, start_date_str, end_date_str, sort_key)
-        ret = redis_store.hget(redis_key, page)
+        redis_key = "%s_%s" % (get_houses_list_key(area_id, start_date, end_date, sort_key), page)
     except Exception as e:
-        #如果没有获取到数据，记录日志信息
+        #即使发生异常，也不能终止视图函数的执行，后面需要继续查询数据库
         current_app.logger.error(e)
-        #即使发生异常，把查询结果值为None，而不能终止视图函数的执行，后面需要继续查询数据库
-        ret = None
-    #如果从redis缓存数据库中，获取到了数据
-    if ret:
-        current_app.logger.info("hit houses list redis")
-        return ret
-    #查询mysql数据库
-    try:
-        #定义变量，用来存储过滤条件
-        filter_params = []
-        #首先判断区域id
-        if area_id:
-            filter_params.append(House.area_id == area_id)
-        #对日期进行校验，过滤所有不满足条件的数据
-        if start_date and end_date:            
-            conflict_orders = Order.query.filter(Order.begin_date <= end_date, Order.end_date >= start_date).all()
-            conflict_houses_ids = [order.house_id for order in conflict_orders]
-            if conflict_houses_ids:
-                filter_params.append(House.id.notin_(conflict_houses_ids))
-        #过滤掉所有不符合条件的数据
-        elif start_date:
-            conflict_orders = Order.query.filter(Order.end_date >= start_date).all()
-            conflict_houses_ids = [order.house_id for order in conflict_orders]
-            if conflict_houses_ids:
-                filter_params.append(House.id.notin_(conflict_houses_ids))
-        elif end_date:
-            conflict_orders = Order.query.filter(Order.begin_date <= end_date).all()
-            conflict_houses_ids = [order.house_id for order in conflict_orders]
-            if conflict_houses_ids:
-                filter_params.append(House.id.notin_(conflict_houses_ids))
-        #按成交量排序、价格排序
-        if "booking" == sort_key:
-            houses = House.query.filter(*filter_params).order_by(House.order_count.desc()) 
-        elif "price-inc" == sort_key:
-            houses = House.query.filter(*filter_params).order_by(House.price.asc())
-        elif "price-des" == sort_key:
-            houses = House.query.filter(*filter_params).order_by(House.price.desc())
-        #如果用户没有传递参数，默认按房源的创建时间进行排序
+        redis_key = None
+
+    #页数超过总页数时的响应数据，这样的页数不进行缓存，避免客户端请求任意页数时产生大量缓存
+    out_of_range = {}
+
+    def load_houses():
+        """查询mysql数据库，构造房屋列表的响应数据并转成json，页数超过总页数时返回None，不进行缓存"""
+        #根据区域和日期构造过滤条件
+        filter_params = get_houses_filter_params(area_id, start_date, end_date)
+        #按成交量排序、价格排序，如果用户没有传递参数，默认按房源的创建时间进行排序
+        sort_column, sort_desc = HOUSE_SORT_COLUMNS.get(sort_key, HOUSE_SORT_COLUMNS["new"])
+        #只查询房屋搜索表，不需要连表
+        if sort_desc:
+            houses = HouseSearch.query.filter(*filter_params).order_by(sort_column.desc(), HouseSearch.id.desc())
         else:
-            houses = House.query.filter(*filter_params).order_by(House.create_time.desc())
+            houses = HouseSearch.query.filter(*filter_params).order_by(sort_column.asc(), HouseSearch.id.asc())
         #根据参数进行排序，paginate进行分页，保留房源信息和房源页数
         houses_page = houses.paginate(page, constants.HOUSE_LIST_PAGE_CAPACITY, False)
-        houses_list = houses_page.items
         total_page = houses_page.pages
-        #定义变量，用来保存房源信息
-        houses_dict_list = []
-        for house in houses_list:
-            houses_dict_list.append(house.to_basic_dict())
+        #房屋搜索表中已经保存了区域名字和房东头像，直接序列化房源信息
+        houses_dict_list = [house.to_basic_dict() for house in houses_page.items]
+        #构造响应数据，并转成json
+        resp = {"errno": RET.OK, "errmsg": "OK", "data": {"houses": houses_dict_list,
+                                                          "total_page": total_page, "current_page": page}}
+        resp_json = json.dumps(resp)
+        if page > total_page:
+            out_of_range["resp"] = resp_json
+            return None
+        return resp_json
+    #通过redis缓存获取房源信息，缓存不存在或过期时才查询mysql数据库
+    try:
+        if redis_key:
+            entry = read_through_entry(redis_key, constants.HOUSE_LIST_REDIS_EXPIRES, load_houses)
+        else:
+            entry = None
+            resp_json = load_houses()
+            if resp_json is not None:
+                entry = (resp_json, make_etag(resp_json))
     except Exception as e:
         #如果发生异常，直接返回异常信息，整个把区域id、日期、排序条件、分页整体判断
         current_app.logger.error(e)
         return jsonify(errno=RET.DBERR, errmsg="查询数据失败")
-    #构造响应数据，返回前端
-    resp = {"errno": RET.OK, "errmsg": "OK", "data": {"houses": houses_dict_list,
-                                                      "total_page": total_page, "current_page": page}}
-    #把响应数据转成json
-    resp_json = json.dumps(resp)
-    if page <= total_page:
-        redis_key = "houses_%s_%s_%s_%s" % (area_id, start_date_str, end_date_str, sort_key)
-        #通过redis的pipeline()，实现对redis多条数据的事务操作
-        pipe = redis_store.pipeline()
-        try: 
-            #对多条数据进行缓存操作，统一设置过期时间
-            pipe.multi()
-            pipe.hset(redis_key, page, resp_json)
-            pipe.expire(redis_key, constants.HOME_PAGE_DATA_REDIS_EXPIRES)
-            pipe.execute()
-        except Exception as e:
-            current_app.logger.error(e)
-    #把响应结果返回前端
-    return resp_json
+    if entry is None:
+        #页数超过总页数，返回没有缓存的响应数据
+        resp_json = out_of_range["resp"]
+        entry = (resp_json, make_etag(resp_json))
+    resp_json, etag = entry
+    #把缓存中的响应报文返回前端
+    return make_cached_response(resp_json, etag)
+
+# 房屋列表的排序方式：房屋搜索表的排序字段，是否倒序；排序值相同时再按房屋编号排序，保证分页结果稳定
+HOUSE_SORT_COLUMNS = {
+    "new": (HouseSearch.create_time, True),  # 按发布时间倒序
+    "booking": (HouseSearch.order_count, True),  # 按成交量倒序
+    "price-inc": (HouseSearch.price, False),  # 按价格升序
+    "price-des": (HouseSearch.price, True)  # 按价格倒序
+}
+
+
+def get_houses_filter_params(area_id, start_date, end_date):
+    """根据区域和日期构造房屋列表（房屋搜索表）的过滤条件"""
+    filter_params = []
+    #首先判断区域id
+    if area_id:
+        filter_params.append(HouseSearch.area_id == area_id)
+    #对日期进行校验，过滤所有与用户选择日期冲突的房屋，冲突的房屋较少时由预订日期索引提供房屋编号
+    if start_date or end_date:
+        conflict_houses_ids = availability.get_conflict_house_ids(start_date, end_date)
+        if conflict_houses_ids is None:
+            #索引不可用或冲突的房屋过多，不传递房屋编号列表，在mysql中逐个房屋检查订单
+            filter_params.append(~availability.conflict_clause(HouseSearch.id, start_date, end_date))
+        elif conflict_houses_ids:
+            filter_params.append(HouseSearch.id.notin_(conflict_houses_ids))
+    return filter_params
+
+
+def get_houses_by_cursor(area_id, start_date, end_date, sort_key, cursor):
+    """
+    房屋列表的游标分页
+    游标中保存上一页最后一个房屋的排序值和房屋编号，下一页从该位置之后开始查询，
+    响应数据中的next为下一页的游标，为空表示没有更多数据；传递参数tp=1时才统计总页数
+    """
+    sort_key = sort_key if sort_key in HOUSE_SORT_COLUMNS else "new"
+    sort_column, sort_desc = HOUSE_SORT_COLUMNS[sort_key]
+    #解析游标，还原上一页最后一个房屋的排序值和编号
+    try:
+        last_value, last_id = decode_cursor(cursor) if cursor else (None, None)
+        if cursor and "new" == sort_key:
+            last_value = datetime.datetime.strptime(last_value, "%Y-%m-%d %H:%M:%S.%f")
+    except Exception as e:
+        current_app.logger.error(e)
+        return jsonify(errno=RET.PARAMERR, errmsg="分页参数不正确")
+    try:
+        filter_params = get_houses_filter_params(area_id, start_date, end_date)
+        houses = HouseSearch.query.filter(*filter_params)
+        total_page = None
+        if "1" == request.args.get("tp"):
+            total_count = houses.order_by(None).count()
+            total_page = (total_count + constants.HOUSE_LIST_PAGE_CAPACITY - 1) // constants.HOUSE_LIST_PAGE_CAPACITY
+        #从游标位置开始的范围查询，多查询一条数据用来判断是否还有下一页
+        if sort_desc:
+            if cursor:
+                houses = houses.filter(or_(sort_column < last_value,
+                                           and_(sort_column == last_value, HouseSearch.id < last_id)))
+            houses = houses.order_by(sort_column.desc(), HouseSearch.id.desc())
+        else:
+            if cursor:
+                houses = houses.filter(or_(sort_column > last_value,
+                                           and_(sort_column == last_value, HouseSearch.id > last_id)))
+            houses = houses.order_by(sort_column.asc(), HouseSearch.id.asc())
+        houses_list = houses.limit(constants.HOUSE_LIST_PAGE_CAPACITY + 1).all()
+        has_next = len(houses_list) > constants.HOUSE_LIST_PAGE_CAPACITY
+        houses_list = houses_list[:constants.HOUSE_LIST_PAGE_CAPACITY]
+        houses_dict_list = [house.to_basic_dict() for house in houses_list]
+    except Exception as e:
+        current_app.logger.error(e)
+        return jsonify(errno=RET.DBERR, errmsg="查询数据失败")
+    #生成下一页的游标
+    next_cursor = ""
+    if has_next:
+        last_house = houses_list[-1]
+        last_value = getattr(last_house, sort_column.key)
+        if "new" == sort_key:
+            last_value = last_value.strftime("%Y-%m-%d %H:%M:%S.%f")
+        next_cursor = encode_cursor([last_value, last_house.id])
+    data = {"houses": houses_dict_list, "next": next_cursor}
+    if total_page is not None:
+        data["total_page"] = total_page
+    return jsonify(errno=RET.OK, errmsg="OK", data=data)
+
+
+def get_facility_ids():
+    """获取所有设施的编号，设施信息几乎不会变化，依次读取进程内缓存、redis缓存、mysql数据库"""
+    def load_facility_ids():
+        facility_ids = [facility_id for facility_id, in db.session.query(Facility.id)]
+        return json.dumps(facility_ids)
+    json_ids = read_local("facility_info",
+                          lambda: read_through("facility_info", constants.FACILITY_INFO_REDIS_EXPIRES, load_facility_ids))
+    return set(json.loads(json_ids))
@@ -2,11 +2,17 @@
 
 import datetime
 
-from flask import request, g, jsonify, current_app
-from ihome import db, redis_store
-from ihome.utils.commons import login_required
+from sqlalchemy import and_, or_
+
+from flask import request, g, jsonify, current_app, Response
+from ihome import db, redis_store, constants
+from ihome.utils.commons import login_required, encode_cursor, decode_cursor
 from ihome.utils.response_code import RET
-from ihome.models import House, Order
+from ihome.utils import availability, house_rank, order_stream
+from ihome.utils.cache import bump_houses_area, bump_houses_dates
+from ihome.utils.order_events import emit_order_event, ORDER_CREATED, ORDER_ACCEPTED, ORDER_REJECTED, \
+    ORDER_COMMENTED
+from ihome.models import House, Order, HouseSearch
 from . import api
 
 
@@ -38,27 +44,36 @@ def save_order():
     except Exception as e:
         current_app.logger.error(e)
         return jsonify(errno=RET.PARAMERR, errmsg="日期格式错误")
-    #获取房屋id
+    #获取房屋信息，并锁定房屋记录（SELECT ... FOR UPDATE），直到订单保存提交后才释放，
+    #同一房屋的预订请求依次执行日期检查和保存订单，不同房屋的预订互不影响，避免同一日期被重复预订
+    #锁定房屋是本次事务的第一条查询，之后的日期冲突检查能够读取到前一个预订请求已提交的订单
     try:
-        house = House.query.get(house_id)
+        house = House.query.filter(House.id == house_id).with_for_update().first()
     except Exception as e:
         current_app.logger.error(e)
+        db.session.rollback()
         return jsonify(errno=RET.DBERR, errmsg="获取房屋信息失败")
     #进一步校验查询结果，房屋不存在
     if not house:
+        db.session.rollback()
         return jsonify(errno=RET.NODATA, errmsg="房屋不存在")
     #确保房东不能预订自己的房屋
     if user_id == house.user_id:
+        db.session.rollback()
         return jsonify(errno=RET.ROLEERR, errmsg="不能预订自己的房屋")
-    #确保用户选择的房屋未被预订，日期没有冲突
+    #确保用户选择的房屋未被预订，日期没有冲突，已拒单和已取消的订单不再占用日期
+    #查询使用订单表的(house_id, begin_date, end_date)索引
     try:
         count = Order.query.filter(Order.house_id == house_id, Order.begin_date <= end_date,
-                                   Order.end_date >= start_date).count()
+                                   Order.end_date >= start_date,
+                                   Order.status.notin_(constants.ORDER_INACTIVE_STATUS)).count()
     except Exception as e:
         current_app.logger.error(e)
+        db.session.rollback()
         return jsonify(errno=RET.DBERR, errmsg="检查出错，请稍候重试")
     #校验查询结果
     if count > 0:
+        db.session.rollback()
         return jsonify(errno=RET.DATAERR, errmsg="房屋已被预订")
     #生成订单信息，计算总价，保存订单信息到数据库中
     amount = days * house.price
@@ -70,7 +85,7 @@ def save_order():
     order.days = days
     order.house_price = house.price
     order.amount = amount
-    #把订单数据存储到mysql数据库中，如果发生异常，进行回滚操作
+    #把订单数据存储到mysql数据库中，提交事务的同时释放房屋记录的锁，如果发生异常，进行回滚操作
     try:
         db.session.add(order)
         db.session.commit()
@@ -78,6 +93,12 @@ def save_order():
         current_app.logger.error(e)
         db.session.rollback()
         return jsonify(errno=RET.DBERR, errmsg="保存订单失败")
+    #把房屋的预订日期写入预订日期索引，供房屋搜索使用
+    availability.mark_booked(order.house_id, start_date, end_date)
+    #使日期相关的房屋列表缓存失效
+    bump_houses_dates(start_date, end_date)
+    #发出新订单事件，通知房东
+    emit_order_event(ORDER_CREATED, order, house)
     #返回响应数据
     return jsonify(errno=RET.OK, errmsg="OK", data={"order_id": order.id})
 
@@ -85,31 +106,76 @@ def save_order():
 @api.route("/user/orders", methods=["GET"])
 @login_required
 def get_user_orders():
-    """获取订单信息"""
+    """
+    获取订单信息
+    订单与房屋连表查询，只查询需要的字段，每次请求只执行一次查询；
+    可以通过参数status筛选订单状态；使用游标分页，不携带参数c时返回第一页，响应数据中的next为下一页的游标，为空表示没有更多订单
+    """
     #获取用户id
     user_id = g.user_id
-    #获取用户角色参数
+    #获取用户角色参数、订单状态参数、分页游标参数
     role = request.args.get("role", "")
-    #验证用户角色
+    status = request.args.get("status", "")
+    cursor = request.args.get("c", "")
+    #校验订单状态
+    if status and status not in Order.status.type.enums:
+        return jsonify(errno=RET.PARAMERR, errmsg="参数错误")
+    #解析游标，还原上一页最后一个订单的创建时间和编号
     try:
-        #如果角色为房东，首先查询该房东共有多少房子，然后查询订房信息
+        last_time, last_id = decode_cursor(cursor) if cursor else (None, None)
+        if cursor:
+            last_time = datetime.datetime.strptime(last_time, "%Y-%m-%d %H:%M:%S.%f")
+    except Exception as e:
+        current_app.logger.error(e)
+        return jsonify(errno=RET.PARAMERR, errmsg="分页参数不正确")
+    try:
+        orders = db.session.query(Order.id, Order.begin_date, Order.end_date, Order.create_time, Order.days,
+                                  Order.amount, Order.status, Order.comment, House.title, House.index_image_url)\
+            .join(House, Order.house_id == House.id)
+        #如果角色为房东，查询该房东所有房屋的订单，否则查询用户自己的订单
         if "landlord" == role:
-            houses = House.query.filter(House.user_id == user_id).all()
-            houses_ids = [house.id for house in houses]
-            orders = Order.query.filter(Order.house_id.in_(houses_ids)).order_by(Order.create_time.desc()).all()
-        #如果角色为普通订房者
+            orders = orders.filter(House.user_id == user_id)
         else:
-            orders = Order.query.filter(Order.user_id == user_id).order_by(Order.create_time.desc()).all()
+            orders = orders.filter(Order.user_id == user_id)
+        if status:
+            orders = orders.filter(Order.status == status)
+        #从游标位置开始的范围查询，多查询一条数据用来判断是否还有下一页
+        if cursor:
+            orders = orders.filter(or_(Order.create_time < last_time,
+                                       and_(Order.create_time == last_time, Order.id < last_id)))
+        orders = orders.order_by(Order.create_time.desc(), Order.id.desc())\
+            .limit(constants.ORDER_LIST_PAGE_CAPACITY + 1).all()
     except Exception as e:
         current_app.logger.error(e)
         return jsonify(errno=RET.DBERR, errmsg="查询订单信息失败")
     #构造响应数据，返回前端
-    orders_dict_list = []
-    if orders:
-        for order in orders:
-            orders_dict_list.append(order.to_dict())
+    data = {"next": ""}
+    if len(orders) > constants.ORDER_LIST_PAGE_CAPACITY:
+        orders = orders[:constants.ORDER_LIST_PAGE_CAPACITY]
+        last_order = orders[-1]
+        data["next"] = encode_cursor([last_order.create_time.strftime("%Y-%m-%d %H:%M:%S.%f"), last_order.id])
+    data["orders"] = [Order.row_to_dict(order) for order in orders]
     #返回前端响应数据
-    return jsonify(errno=RET.OK, errmsg="OK", data={"orders": orders_dict_list})
+    return jsonify(errno=RET.OK, errmsg="OK", data=data)
+
+
+@api.route("/user/orders/stream", methods=["GET"])
+@login_required
+def stream_user_orders():
+    """
+    订单变化推送（Server-Sent Events），订单保存、接单拒单、评价之后，只推送发生变化的订单，
+    订单数据与get_user_orders中的订单相同，客户端不需要重新获取整个订单列表
+    角色为房东时推送该房东所有房屋的订单，否则推送用户自己的订单
+    """
+    #不是使用gevent协程运行时，推送的长连接会一直占用线程或工作进程，拒绝推送，客户端改为定时获取订单列表
+    if not order_stream.cooperative():
+        return jsonify(errno=RET.REQERR, errmsg="订单推送不可用，请刷新订单列表")
+    role = "landlord" if "landlord" == request.args.get("role") else "custom"
+    response = Response(order_stream.stream(role, g.user_id), mimetype="text/event-stream")
+    #禁止缓存，并关闭nginx对响应的缓冲，使推送的消息立即发送到客户端
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @api.route("/orders/<int:order_id>/status", methods=["PUT"])
@@ -158,6 +224,12 @@ def accept_reject_order(order_id):
         current_app.logger.error(e)
         db.session.rollback()
         return jsonify(errno=RET.DBERR, errmsg="操作失败")
+    #拒单后房屋的日期重新变为可预订，从预订日期索引中释放
+    if action == "reject":
+        availability.release(order.house_id, order.begin_date, order.end_date)
+        bump_houses_dates(order.begin_date, order.end_date)
+    #发出订单状态变化事件
+    emit_order_event(ORDER_ACCEPTED if action == "accept" else ORDER_REJECTED, order, house)
     #返回前端响应数据
     return jsonify(errno=RET.OK, errmsg="OK")
 
@@ -190,10 +262,11 @@ def save_order_comment(order_id):
     try:
         order.status = "COMPLETE"
         order.comment = comment
-        #把订单成交数加1
+        #把订单成交数加1，并同步更新房屋搜索表
         house.order_count += 1
         db.session.add(order)
         db.session.add(house)
+        HouseSearch.refresh(house)
         db.session.commit()
     except Exception as e:
         #如果发生异常信息，记录日志，进行回滚操作
@@ -205,5 +278,10 @@ def save_order_comment(order_id):
         redis_store.delete("house_info_%s" % order.house.id)
     except Exception as e:
         current_app.logger.error(e)
+    #房屋成交量变化，使房屋列表缓存失效，并更新首页房屋排行
+    bump_houses_area(house.area_id)
+    house_rank.update_house_rank(house)
+    #发出订单评价事件，通知房东
+    emit_order_event(ORDER_COMMENTED, order, house)
     #返回前端响应结果
     return jsonify(errno=RET.OK, errmsg="OK")
@@ -1,12 +1,12 @@
 # -*- coding:utf-8 -*-
 
-from flask import request, jsonify, g, current_app, session
+from flask import request, jsonify, g, current_app, session, url_for
 from ihome.utils.response_code import RET
-from ihome.models import User
-from ihome import db
+from ihome.models import User, House, HouseSearch
+from ihome import db, redis_store
 from ihome.utils.commons import login_required
-from ihome.utils.image_storage import storage
-from ihome import constants
+from ihome.utils.cache import bump_houses_area
+from ihome.utils.image_upload import image_uploader, UPLOAD_PENDING
 from . import api
 
 
@@ -58,25 +58,44 @@ def set_user_avatar():
     #参数不存在
     if not avatar:
         return jsonify(errno=RET.PARAMERR, errmsg="未传头像")
-    #把图片信息读取保存
+    #把图片信息读取保存，写入本地暂存目录后由后台线程上传到存储后端，上传完成后保存头像
     avatar_data = avatar.read()
     try:
-        #调用七牛云接口，实现图片上传
-        img_name = storage(avatar_data)
+        upload_id = image_uploader.submit("user_avatar", user_id, avatar_data)
     except Exception as e:
         current_app.logger.error(e)
-        return jsonify(errno=RET.THIRDERR, errmsg="上传头像失败")
+        return jsonify(errno=RET.IOERR, errmsg="上传头像失败")
+    #上传完成前，头像地址返回暂存图片的预览地址
+    img_url = url_for("api.get_upload_image", upload_id=upload_id)
+    return jsonify(errno=RET.OK, errmsg="保存头像成功", data={"avatar_url": img_url, "upload_id": upload_id,
+                                                          "status": UPLOAD_PENDING})
+
+
+def save_user_avatar(image_name, user_id):
+    """头像上传到存储后端后，在后台线程中把头像保存到mysql数据库，同时更新房屋搜索表中该用户房屋的房东头像"""
     try:
-        #操作数据库，把用户头像信息的url存储到mysql数据库中
-        User.query.filter_by(id=user_id).update({"avatar_url": img_name})
+        User.query.filter_by(id=user_id).update({"avatar_url": image_name})
+        HouseSearch.refresh_user_avatar(user_id, image_name)
         db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    #房屋列表和房屋详情的缓存中带有房东头像，使该用户房屋所在区域的房屋列表缓存失效，并删除房屋详情缓存
+    try:
+        houses = db.session.query(House.id, House.area_id).filter(House.user_id == user_id).all()
     except Exception as e:
         current_app.logger.error(e)
-        db.session.rollback()
-        return jsonify(errno=RET.DBERR, errmsg="保存头像失败")
-    #拼接图片url信息，并且把响应结果返回给前端
-    img_url = constants.QINIU_DOMIN_PREFIX + img_name
-    return jsonify(errno=RET.OK, errmsg="保存头像成功", data={"avatar_url": img_url})
+        return
+    for area_id in set(area_id for _, area_id in houses):
+        bump_houses_area(area_id)
+    if houses:
+        try:
+            redis_store.delete(*["house_info_%s" % house_id for house_id, _ in houses])
+        except Exception as e:
+            current_app.logger.error(e)
+
+
+image_uploader.register_handler("user_avatar", save_user_avatar)
 
 
 @api.route("/user", methods=["GET"])
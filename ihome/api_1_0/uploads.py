@@ -0,0 +1,65 @@
+# -*- coding:utf-8 -*-
+
+import imghdr
+
+from flask import current_app, jsonify, redirect, send_file
+from ihome.utils.response_code import RET
+from ihome.utils.image_upload import image_uploader, UPLOAD_PENDING, UPLOAD_FAILED
+from ihome.utils.image_process import image_url
+from ihome.utils.image_storage import get_backend, LocalStorage
+from . import api
+
+
+@api.route("/uploads/<regex(r'[0-9a-f]{32}'):upload_id>", methods=["GET"])
+def get_upload_image(upload_id):
+    """
+    获取异步上传的图片
+    上传完成前返回本地暂存的图片，上传完成后重定向到存储后端中大尺寸版本的图片；
+    该地址只在上传期间用于预览，上传完成后客户端应改用上传状态接口返回的图片地址
+    """
+    try:
+        status = image_uploader.get_status(upload_id)
+    except Exception as e:
+        current_app.logger.error(e)
+        return jsonify(errno=RET.DBERR, errmsg="查询上传状态失败")
+    if status is None:
+        return jsonify(errno=RET.NODATA, errmsg="图片不存在")
+    if status == UPLOAD_FAILED:
+        return jsonify(errno=RET.THIRDERR, errmsg="上传图片失败")
+    if status != UPLOAD_PENDING:
+        return redirect(image_url(status, "large"))
+    #图片还在上传中，返回暂存目录中的图片
+    image_path = image_uploader.get_spool_path(upload_id)
+    if image_path is None:
+        return jsonify(errno=RET.NODATA, errmsg="图片不存在")
+    image_type = imghdr.what(image_path) or "jpeg"
+    return send_file(image_path, mimetype="image/" + image_type, cache_timeout=0)
+
+
+@api.route("/uploads/<regex(r'[0-9a-f]{32}'):upload_id>/status", methods=["GET"])
+def get_upload_status(upload_id):
+    """查询图片上传状态，上传完成后返回存储后端中大尺寸版本的图片地址"""
+    try:
+        status = image_uploader.get_status(upload_id)
+    except Exception as e:
+        current_app.logger.error(e)
+        return jsonify(errno=RET.DBERR, errmsg="查询上传状态失败")
+    if status is None:
+        return jsonify(errno=RET.NODATA, errmsg="上传任务不存在")
+    data = {"upload_id": upload_id, "status": status}
+    if status not in (UPLOAD_PENDING, UPLOAD_FAILED):
+        data["status"] = "done"
+        data["url"] = image_url(status, "large")
+    return jsonify(errno=RET.OK, errmsg="OK", data=data)
+
+
+@api.route("/images/<path:name>", methods=["GET"])
+def get_local_image(name):
+    """使用本地磁盘存储后端时，返回保存在本地的图片"""
+    backend = get_backend()
+    if not isinstance(backend, LocalStorage):
+        return jsonify(errno=RET.NODATA, errmsg="图片不存在"), 404
+    response = backend.serve(name)
+    if response is None:
+        return jsonify(errno=RET.NODATA, errmsg="图片不存在"), 404
+    return response
@@ -6,7 +6,10 @@ import random
 from flask import request, jsonify, current_app, make_response
 from ihome.utils.response_code import RET
 from ihome.utils.captcha.captcha import captcha
-from ihome.utils import sms
+from ihome.utils.captcha_pool import pop_captcha
+from ihome.utils.captcha_token import make_captcha_token, check_captcha_token, CAPTCHA_TOKEN_COOKIE, \
+    TOKEN_OK, TOKEN_EXPIRED
+from ihome.utils.sms_queue import throttle_mobile, release_mobile, enqueue_sms
 from ihome import redis_store, constants
 from ihome.models import User
 from . import api
@@ -14,8 +17,21 @@ from . import api
 #生成图片验证码
 @api.route("/imagecode/<image_code_id>", methods=["GET"])
 def generate_image_code(image_code_id):
-    #调用第三方接口来实现图片验证码的获取，name是图片验证码的名字，text图片验证码的内容，image就是图片信息
-    name, text, image = captcha.generate_captcha()
+    #优先从预先生成的验证码池中取出验证码，池为空时才调用第三方接口同步生成，text图片验证码的内容，image就是图片信息
+    #令牌模式下不记录验证码池的统计，只从池中取出验证码
+    token_mode = current_app.config.get("CAPTCHA_TOKEN_MODE")
+    entry = pop_captcha(stats=not token_mode)
+    if entry:
+        text, image = entry
+    else:
+        name, text, image = captcha.generate_captcha()
+    #令牌模式：验证码内容签名后通过cookie返回给客户端，不写入redis
+    if token_mode:
+        response = make_response(image)
+        response.headers["Content-Type"] = "image/jpg"
+        response.set_cookie(CAPTCHA_TOKEN_COOKIE, make_captcha_token(image_code_id, text),
+                            max_age=constants.IMAGE_CODE_REDIS_EXPIRES, httponly=True)
+        return response
     try:
         #把图片验证码存入redis数据库中
         redis_store.setex("ImageCode_" + image_code_id, constants.IMAGE_CODE_REDIS_EXPIRES, text)
@@ -48,6 +64,21 @@ def send_sms_code(mobile):
     #判断手机号格式是否符合要求，通过正则表达式进行判断
     if not re.match(r"^1[34578]\d{9}$", mobile):
         return jsonify(errno=RET.PARAMERR, errmsg="手机号格式错误")
+    #令牌模式：在本地校验验证码令牌的签名，redis中只记录已使用的令牌
+    if current_app.config.get("CAPTCHA_TOKEN_MODE"):
+        token = request.args.get("token") or request.cookies.get(CAPTCHA_TOKEN_COOKIE)
+        if not token:
+            return jsonify(errno=RET.DATAERR, errmsg="图片验证码过期")
+        try:
+            result = check_captcha_token(token, image_code_id, image_code)
+        except Exception as e:
+            current_app.logger.error(e)
+            return jsonify(errno=RET.DBERR, errmsg="查询数据异常")
+        if result == TOKEN_EXPIRED:
+            return jsonify(errno=RET.DATAERR, errmsg="图片验证码过期")
+        if result != TOKEN_OK:
+            return jsonify(errno=RET.DATAERR, errmsg="图片验证码错误")
+        return send_sms(mobile)
     try:  
         #查询redis数据库中存储的真实图片验证码
         real_image_code = redis_store.get("ImageCode_" + image_code_id)
@@ -65,6 +96,19 @@ def send_sms_code(mobile):
     #把用户的图片验证码和缓存的真实验证码统一转为一种格式，进行比较
     if image_code.lower() != real_image_code.lower():
         return jsonify(errno=RET.DATAERR, errmsg="图片验证码错误")    
+    return send_sms(mobile)
+
+
+def _release_mobile(mobile):
+    """短信没有发出，解除手机号的发送间隔限制，redis出错时只记录日志，限制到期后自动解除"""
+    try:
+        release_mobile(mobile)
+    except Exception as e:
+        current_app.logger.error(e)
+
+
+def send_sms(mobile):
+    """图片验证码校验通过后，检查手机号是否已注册，生成并发送短信验证码"""
     try:
         #查询手机号是否已经注册
         user = User.query.filter_by(mobile=mobile).first()
@@ -73,6 +117,14 @@ def send_sms_code(mobile):
     else:
         if user is not None:
             return jsonify(errno=RET.DBERR, errmsg="手机号已存在")   
+    try:
+        #同一手机号在限制时间内只能发送一次短信，之前发送的短信验证码仍然有效
+        allowed = throttle_mobile(mobile)
+    except Exception as e:
+        current_app.logger.error(e)
+        return jsonify(errno=RET.DBERR, errmsg="查询数据异常")
+    if not allowed:
+        return jsonify(errno=RET.REQERR, errmsg="请求过于频繁，请稍后再试")
     #开始生成短信验证码，格式化输出，确保输出的短信验证码位数
     sms_code = '%06d' % random.randint(0, 1000000)    
     try:
@@ -80,16 +132,13 @@ def send_sms_code(mobile):
         redis_store.setex("SMSCode_" + mobile, constants.SMS_CODE_REDIS_EXPIRES, sms_code)
     except Exception as e:
         current_app.logger.error(e)
+        _release_mobile(mobile)
         return jsonify(errno=RET.DBERR, errmsg="保存数据出现错误")    
     try:
-        #发送短信验证码
-        ccp = sms.CCP()
-        result = ccp.send_template_sms(mobile, [sms_code, constants.SMS_CODE_REDIS_EXPIRES/60], 1)
+        #把短信验证码加入发送队列，由短信发送进程调用云通讯接口发送，失败时自动重试
+        enqueue_sms(mobile, [sms_code, constants.SMS_CODE_REDIS_EXPIRES/60], 1)
     except Exception as e:
         current_app.logger.error(e)
-        return jsonify(errno=RET.THIRDERR, errmsg="发送短信异常")
-    #判断语句，建议把变量写在后面，常量建议写在前面，防止表达式错误
-    if 0 == result:
-        return jsonify(errno=RET.OK, errmsg="发送成功")
-    else:
-        return jsonify(errno=RET.THIRDERR, errmsg="发送短信失败")
+        _release_mobile(mobile)
+        return jsonify(errno=RET.DBERR, errmsg="发送短信异常")
+    return jsonify(errno=RET.OK, errmsg="发送成功")
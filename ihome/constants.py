@@ -18,6 +18,9 @@ HOME_PAGE_MAX_HOUSES = 5
 # 首页房屋数据的Redis缓存时间，单位：秒
 HOME_PAGE_DATA_REDIS_EXPIRES = 7200
 
+# 首页房屋排行为空（没有房屋有主图片）的标记的有效期，期间不再从mysql重建排行，单位：秒
+HOUSE_RANK_EMPTY_EXPIRES = 60
+
 # 房屋详情页展示的评论最大数
 HOUSE_DETAIL_COMMENT_DISPLAY_COUNTS = 30
 
@@ -29,3 +32,131 @@ HOUSE_LIST_PAGE_CAPACITY = 2
 
 # 房屋列表页面Redis缓存时间，单位：秒
 HOUSE_LIST_REDIS_EXPIRES = 7200
+
+# 不再占用房屋日期的订单状态（已拒单、已取消）
+ORDER_INACTIVE_STATUS = ("REJECTED", "CANCELED")
+
+# 房屋预订日期索引，过期日期的Redis数据保留天数，单位：天
+HOUSE_BOOKED_REDIS_KEEP_DAYS = 7
+
+# 房屋预订日期索引，单次搜索支持的最大日期跨度，超过则直接查询mysql，单位：天
+HOUSE_BOOKED_SEARCH_MAX_DAYS = 180
+
+# 日期搜索时直接排除的已预订房屋编号的最大数量，超过时改为在mysql中关联订单表排除
+HOUSE_BOOKED_EXCLUDE_MAX = 500
+
+# 日期搜索时在redis中计算的已预订房屋并集的有效期，正常情况下使用后立即删除，单位：秒
+HOUSE_BOOKED_UNION_EXPIRES = 60
+
+# 房屋预订日期索引未建立时自动重建，重建锁的有效期，有效期内不会再次重建，单位：秒
+HOUSE_BOOKED_REBUILD_LOCK_EXPIRES = 300
+
+# 缓存重建锁的有效期，单位：秒
+CACHE_REBUILD_LOCK_EXPIRES = 10
+
+# 缓存不存在且其他进程正在重建时，等待重建结果的最长时间，单位：秒
+CACHE_REBUILD_WAIT_SECONDS = 1
+
+# 缓存过期后仍可返回旧数据的时间（重建期间返回旧数据），单位：秒
+CACHE_STALE_SECONDS = 300
+
+# 缓存概率提前过期的系数，越大越倾向于提前重建
+CACHE_EARLY_EXPIRE_BETA = 1.0
+
+# 进程内缓存（城区、设施等基础数据）的有效期，失效主要依靠redis发布订阅通知，有效期作为兜底，单位：秒
+LOCAL_CACHE_EXPIRES = 600
+
+# 进程内缓存最多保存的数据条数
+LOCAL_CACHE_MAX_SIZE = 256
+
+# 设施信息redis缓存时间，单位：秒
+FACILITY_INFO_REDIS_EXPIRES = 7200
+
+# 重建房屋搜索表时每批更新的房屋数量，每批提交一次
+HOUSE_SEARCH_REBUILD_BATCH = 1000
+
+# 订单列表每页显示条目数，使用游标分页
+ORDER_LIST_PAGE_CAPACITY = 10
+
+# 图片异步上传任务状态的redis保存时间，单位：秒
+IMAGE_UPLOAD_STATUS_REDIS_EXPIRES = 3600
+
+# 图片上传任务认领后超过该时间没有更新，认为认领的进程已退出，由其他进程重新上传，单位：秒
+IMAGE_UPLOAD_CLAIM_STALE_SECONDS = 600
+
+# 图片上传线程空闲时检查暂存目录中未完成任务的间隔，单位：秒
+IMAGE_UPLOAD_RECOVER_INTERVAL = 60
+
+# 进程退出时等待后台上传线程完成正在处理的任务的最长时间，单位：秒
+IMAGE_UPLOAD_STOP_TIMEOUT = 5
+
+# 上传图片生成的尺寸版本，版本名: (最大宽度, 最大高度)，缩放时保持宽高比
+IMAGE_VARIANTS = {
+    "thumb": (240, 180),
+    "medium": (640, 480),
+    "large": (1280, 960),
+}
+
+# 图片版本重新编码的质量
+IMAGE_JPEG_QUALITY = 80
+IMAGE_WEBP_QUALITY = 75
+
+# 七牛上传凭证的有效期，单位：秒
+QINIU_UPLOAD_TOKEN_EXPIRES = 3600
+
+# 七牛上传凭证距离过期不足该时间时重新生成，单位：秒
+QINIU_UPLOAD_TOKEN_REFRESH_SECONDS = 300
+
+# 七牛上传连接池的连接数，不小于后台上传线程数
+QINIU_CONNECTION_POOL_SIZE = 10
+
+# 七牛上传建立连接失败时的重试次数
+QINIU_CONNECTION_RETRIES = 3
+
+# 七牛上传的超时时间，单位：秒
+QINIU_UPLOAD_TIMEOUT = 30
+
+# 超过该大小的文件使用分块上传，单位：字节
+QINIU_CHUNKED_UPLOAD_THRESHOLD = 4 * 1024 * 1024
+
+# 本地磁盘存储的图片允许客户端缓存的时间，单位：秒
+LOCAL_IMAGE_CACHE_SECONDS = 31536000
+
+# 预先生成的图片验证码池的大小
+CAPTCHA_POOL_SIZE = 1000
+
+# 验证码生成进程检查验证码池的间隔，单位：秒
+CAPTCHA_POOL_REFILL_INTERVAL = 1
+
+# 补充验证码池时每批生成的数量，每批写入一次redis
+CAPTCHA_POOL_REFILL_BATCH = 50
+
+# 同一手机号发送短信的最小间隔，单位：秒
+SMS_SEND_INTERVAL = 60
+
+# 所有短信发送进程每秒最多发送的短信数量
+SMS_GLOBAL_RATE_PER_SECOND = 20
+
+# 短信发送失败后的最大发送次数
+SMS_MAX_ATTEMPTS = 5
+
+# 短信发送失败后第一次重试的等待时间，之后每次加倍，单位：秒
+SMS_RETRY_BASE_DELAY = 2
+
+# 队列处理进程心跳的有效期，超过该时间没有心跳的进程视为已退出，其处理中的任务移回队列，单位：秒
+QUEUE_WORKER_HEARTBEAT_EXPIRES = 30
+
+# 队列处理进程检查已退出进程、回收其处理中任务的间隔，单位：秒
+QUEUE_REAP_INTERVAL = 10
+
+# 房东订单汇总通知的时间窗口，第一个订单事件之后等待该时间再发送通知，期间的事件合并为一条通知，单位：秒
+ORDER_DIGEST_WINDOW = 300
+
+# 订单推送连接空闲时发送心跳的间隔，避免代理服务器关闭空闲连接，单位：秒
+ORDER_STREAM_HEARTBEAT_SECONDS = 15
+
+# 订单推送连接断开后客户端重新连接的等待时间，单位：秒
+ORDER_STREAM_RETRY_SECONDS = 3
+
+# 每个订单推送连接最多缓存的未发送消息数量
+ORDER_STREAM_QUEUE_SIZE = 100
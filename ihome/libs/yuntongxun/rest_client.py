@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import json
+import base64
+import hashlib
+import datetime
+import threading
+
+import urllib
+import certifi
+import urllib3
+
+
+class CloopenClient(object):
+    """
+    云通讯REST接口客户端，进程内长期使用
+    所有接口共用一个urllib3连接池（keep-alive，不必每次重新握手），请求和响应都使用json格式，签名、发送、解析只有一处实现
+    """
+
+    def __init__(self, account_sid, account_token, app_id, server_ip, server_port, soft_version,
+                 scheme="https", timeout=(3, 10), pool_size=10):
+        self.account_sid = account_sid
+        self.account_token = account_token
+        self.app_id = app_id
+        self.base_path = "/%s/Accounts/%s/" % (soft_version, account_sid)
+        # 超时时间：(建立连接, 读取响应)，单位：秒；连接池不自动重试，由调用者决定
+        pool_kwargs = {"maxsize": pool_size, "timeout": urllib3.Timeout(connect=timeout[0], read=timeout[1]),
+                       "retries": False}
+        if scheme == "https":
+            self.pool = urllib3.HTTPSConnectionPool(server_ip, int(server_port), cert_reqs="CERT_REQUIRED",
+                                                    ca_certs=certifi.where(), **pool_kwargs)
+        else:
+            self.pool = urllib3.HTTPConnectionPool(server_ip, int(server_port), **pool_kwargs)
+        self.headers = {"Accept": "application/json", "Content-Type": "application/json;charset=utf-8"}
+        # 签名以秒为单位的时间戳计算，同一秒内的请求复用同一个签名
+        self._auth = (None, None, None)
+        self._lock = threading.Lock()
+
+    def _sign(self):
+        """返回(url中的sig参数, Authorization请求头)"""
+        batch = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        with self._lock:
+            if self._auth[0] != batch:
+                sig = hashlib.md5(self.account_sid + self.account_token + batch).hexdigest().upper()
+                auth = base64.b64encode(self.account_sid + ":" + batch)
+                self._auth = (batch, sig, auth)
+            return self._auth[1], self._auth[2]
+
+    def request(self, path, body=None):
+        """
+        调用云通讯接口，有请求包体时使用POST，否则使用GET，返回解析后的json数据
+        网络错误、超时或响应不是json时抛出异常，由调用者决定是否重试
+        """
+        sig, auth = self._sign()
+        headers = dict(self.headers, Authorization=auth)
+        url = self.base_path + path + "?" + urllib.urlencode({"sig": sig})
+        if body is None:
+            resp = self.pool.urlopen("GET", url, headers=headers)
+        else:
+            resp = self.pool.urlopen("POST", url, body=json.dumps(body), headers=headers)
+        return json.loads(resp.data)
+
+    def send_template_sms(self, to, datas, temp_id):
+        """发送模板短信，to为手机号码（多个号码用逗号分隔），datas为模板中的内容数据，temp_id为模板编号"""
+        return self.request("SMS/TemplateSMS", {"to": to, "datas": [str(data) for data in datas],
+                                                "templateId": str(temp_id), "appId": self.app_id})
+
+    def query_sms_template(self, temp_id):
+        """查询短信模板"""
+        return self.request("SMS/QuerySMSTemplate", {"appId": self.app_id, "templateId": str(temp_id)})
+
+    def query_account_info(self):
+        """查询主账号信息"""
+        return self.request("AccountInfo")
+
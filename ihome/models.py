@@ -3,6 +3,7 @@
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from ihome import constants
+from ihome.utils.image_process import image_url, image_webp_url
 from . import db
 
 
@@ -50,7 +51,7 @@ class User(BaseModel, db.Model):
             "user_id": self.id,
             "name": self.name,
             "mobile": self.mobile,
-            "avatar": constants.QINIU_DOMIN_PREFIX + self.avatar_url if self.avatar_url else "",
+            "avatar": image_url(self.avatar_url, "thumb"),
             "create_time": self.create_time.strftime("%Y-%m-%d %H:%M:%S")
         }
         return user_dict
@@ -118,16 +119,36 @@ class House(BaseModel, db.Model):
 
     def to_basic_dict(self):
         """将基本信息转换为字典数据"""
+        return self._basic_dict(self.area.name, self.user.avatar_url)
+
+    @staticmethod
+    def to_basic_dict_list(houses):
+        """
+        批量将房屋基本信息转换为字典数据
+        区域名字与房东头像各用一次查询批量获取，避免每个房屋懒加载area和user，查询次数与房屋数量无关
+        """
+        houses = list(houses)
+        if not houses:
+            return []
+        area_ids = set(house.area_id for house in houses)
+        user_ids = set(house.user_id for house in houses)
+        area_names = dict(db.session.query(Area.id, Area.name).filter(Area.id.in_(area_ids)).all())
+        avatar_urls = dict(db.session.query(User.id, User.avatar_url).filter(User.id.in_(user_ids)).all())
+        return [house._basic_dict(area_names.get(house.area_id), avatar_urls.get(house.user_id)) for house in houses]
+
+    def _basic_dict(self, area_name, user_avatar_url):
+        """根据已获取的区域名字和房东头像，构造基本信息字典"""
         house_dict = {
             "house_id": self.id,
             "title": self.title,
             "price": self.price,
-            "area_name": self.area.name,
-            "img_url": constants.QINIU_DOMIN_PREFIX + self.index_image_url if self.index_image_url else "",
+            "area_name": area_name,
+            "img_url": image_url(self.index_image_url, "medium"),
+            "img_webp_url": image_webp_url(self.index_image_url, "medium"),
             "room_count": self.room_count,
             "order_count": self.order_count,
             "address": self.address,
-            "user_avatar": constants.QINIU_DOMIN_PREFIX + self.user.avatar_url if self.user.avatar_url else "",
+            "user_avatar": image_url(user_avatar_url, "thumb"),
             "ctime": self.create_time.strftime("%Y-%m-%d")
         }
         return house_dict
@@ -138,7 +159,7 @@ class House(BaseModel, db.Model):
             "hid": self.id,
             "user_id": self.user_id,
             "user_name": self.user.name,
-            "user_avatar": constants.QINIU_DOMIN_PREFIX + self.user.avatar_url if self.user.avatar_url else "",
+            "user_avatar": image_url(self.user.avatar_url, "thumb"),
             "title": self.title,
             "price": self.price,
             "address": self.address,
@@ -152,27 +173,30 @@ class House(BaseModel, db.Model):
             "max_days": self.max_days,
         }
 
-        # 房屋图片
+        # 房屋图片，只查询图片路径一列，一次查询获取全部图片，详情页展示大尺寸版本
         img_urls = []
-        for image in self.images:
-            img_urls.append(constants.QINIU_DOMIN_PREFIX + image.url)
+        for url, in db.session.query(HouseImage.url).filter(HouseImage.house_id == self.id).order_by(HouseImage.id):
+            img_urls.append(image_url(url, "large"))
         house_dict["img_urls"] = img_urls
 
-        # 房屋设施
+        # 房屋设施，直接查询房屋设施关系表中的设施编号，不再加载设施对象
         facilities = []
-        for facility in self.facilities:
-            facilities.append(facility.id)
+        for facility_id, in db.session.query(house_facility.c.facility_id)\
+                .filter(house_facility.c.house_id == self.id):
+            facilities.append(facility_id)
         house_dict["facilities"] = facilities
 
-        # 评论信息
+        # 评论信息，订单与评论用户连表查询，一次获取评论内容和评论用户的名字
         comments = []
-        orders = Order.query.filter(Order.house_id == self.id, Order.status == "COMPLETE", Order.comment != None)\
+        orders = db.session.query(Order.comment, Order.update_time, User.name, User.mobile)\
+            .join(User, Order.user_id == User.id)\
+            .filter(Order.house_id == self.id, Order.status == "COMPLETE", Order.comment != None)\
             .order_by(Order.update_time.desc()).limit(constants.HOUSE_DETAIL_COMMENT_DISPLAY_COUNTS)
-        for order in orders:
+        for comment_text, update_time, user_name, user_mobile in orders:
             comment = {
-                "comment": order.comment,  # 评论的内容
-                "user_name": order.user.name if order.user.name != order.user.mobile else "匿名用户",  # 发表评论的用户
-                "ctime": order.update_time.strftime("%Y-%m-%d %H:%M:%S")  # 评价的时间
+                "comment": comment_text,  # 评论的内容
+                "user_name": user_name if user_name != user_mobile else "匿名用户",  # 发表评论的用户
+                "ctime": update_time.strftime("%Y-%m-%d %H:%M:%S")  # 评价的时间
             }
             comments.append(comment)
         house_dict["comments"] = comments
@@ -202,6 +226,12 @@ class Order(BaseModel, db.Model):
     """订单"""
 
     __tablename__ = "ih_order_info"
+    __table_args__ = (
+        db.Index("ix_ih_order_info_house_id_dates", "house_id", "begin_date", "end_date"),  # 预订日期冲突检查
+        db.Index("ix_ih_order_info_user_id_ctime", "user_id", "create_time"),  # 用户的订单列表
+        db.Index("ix_ih_order_info_house_id_ctime", "house_id", "create_time"),  # 房东的订单列表，按房屋查询后排序
+        db.Index("ix_ih_order_info_house_id_status_utime", "house_id", "status", "update_time"),  # 房屋详情页的评论
+    )
 
     id = db.Column(db.Integer, primary_key=True)  # 订单编号
     user_id = db.Column(db.Integer, db.ForeignKey("ih_user_profile.id"), nullable=False)  # 下订单的用户编号
@@ -226,17 +256,125 @@ class Order(BaseModel, db.Model):
 
     def to_dict(self):
         """将订单信息转换为字典数据"""
+        return Order._build_dict(self, self.house.title, self.house.index_image_url)
+
+    @staticmethod
+    def row_to_dict(row):
+        """将订单与房屋连表查询的一行数据转换为字典数据，行中需要包含订单字段以及房屋的title和index_image_url"""
+        return Order._build_dict(row, row.title, row.index_image_url)
+
+    @staticmethod
+    def _build_dict(order, house_title, house_image_url):
+        """根据订单信息和房屋的标题、主图片构造订单字典"""
         order_dict = {
-            "order_id": self.id,
-            "title": self.house.title,
-            "img_url": constants.QINIU_DOMIN_PREFIX + self.house.index_image_url if self.house.index_image_url else "",
-            "start_date": self.begin_date.strftime("%Y-%m-%d"),
-            "end_date": self.end_date.strftime("%Y-%m-%d"),
-            "ctime": self.create_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "days": self.days,
-            "amount": self.amount,
-            "status": self.status,
-            "comment": self.comment if self.comment else ""
+            "order_id": order.id,
+            "title": house_title,
+            "img_url": image_url(house_image_url, "thumb"),
+            "start_date": order.begin_date.strftime("%Y-%m-%d"),
+            "end_date": order.end_date.strftime("%Y-%m-%d"),
+            "ctime": order.create_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "days": order.days,
+            "amount": order.amount,
+            "status": order.status,
+            "comment": order.comment if order.comment else ""
         }
         return order_dict
 
+
+
+class HouseSearch(db.Model):
+    """房屋搜索表，房屋列表页面的只读数据，保存列表中展示的房屋信息以及区域名字、房东头像，查询时不需要连表"""
+
+    __tablename__ = "ih_house_search"
+    __table_args__ = (
+        # 房屋列表按区域筛选后的各种排序
+        db.Index("ix_ih_house_search_area_id_ctime", "area_id", "create_time"),
+        db.Index("ix_ih_house_search_area_id_price", "area_id", "price"),
+        db.Index("ix_ih_house_search_area_id_order_count", "area_id", "order_count"),
+        # 房屋列表不限区域时的各种排序
+        db.Index("ix_ih_house_search_ctime", "create_time"),
+        db.Index("ix_ih_house_search_price", "price"),
+        db.Index("ix_ih_house_search_order_count", "order_count"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 房屋编号
+    user_id = db.Column(db.Integer, nullable=False, index=True)  # 房屋主人的用户编号
+    area_id = db.Column(db.Integer, nullable=False)  # 归属地的区域编号
+    area_name = db.Column(db.String(32), nullable=False)  # 区域名字
+    title = db.Column(db.String(64), nullable=False)  # 标题
+    price = db.Column(db.Integer, default=0)  # 单价，单位：分
+    address = db.Column(db.String(512), default="")  # 地址
+    room_count = db.Column(db.Integer, default=1)  # 房间数目
+    order_count = db.Column(db.Integer, default=0)  # 预订完成的该房屋的订单数
+    index_image_url = db.Column(db.String(256), default="")  # 房屋主图片的路径
+    user_avatar_url = db.Column(db.String(128))  # 房屋主人的头像路径
+    create_time = db.Column(db.DateTime)  # 房屋的发布时间
+
+    @staticmethod
+    def from_house(house, area_name, user_avatar_url):
+        """根据房屋信息、区域名字、房东头像构造房屋搜索表的数据"""
+        return HouseSearch(
+            id=house.id,
+            user_id=house.user_id,
+            area_id=house.area_id,
+            area_name=area_name,
+            title=house.title,
+            price=house.price,
+            address=house.address,
+            room_count=house.room_count,
+            order_count=house.order_count,
+            index_image_url=house.index_image_url,
+            user_avatar_url=user_avatar_url,
+            create_time=house.create_time
+        )
+
+    @staticmethod
+    def refresh(house):
+        """根据房屋信息刷新房屋搜索表中的数据，需要在保存房屋数据的同一个事务中、提交之前调用"""
+        db.session.flush()
+        area_name = db.session.query(Area.name).filter(Area.id == house.area_id).scalar()
+        user_avatar_url = db.session.query(User.avatar_url).filter(User.id == house.user_id).scalar()
+        db.session.merge(HouseSearch.from_house(house, area_name, user_avatar_url))
+
+    @staticmethod
+    def refresh_user_avatar(user_id, avatar_url):
+        """房东修改头像后，更新房东所有房屋的头像数据，需要在保存头像的同一个事务中调用"""
+        HouseSearch.query.filter(HouseSearch.user_id == user_id)\
+            .update({"user_avatar_url": avatar_url}, synchronize_session=False)
+
+    @staticmethod
+    def rebuild():
+        """
+        根据房屋、区域、用户表重新生成整个房屋搜索表
+        逐批更新或插入数据，最后删除已不存在的房屋，重建期间房屋列表不会变为空
+        """
+        rows = db.session.query(House, Area.name, User.avatar_url)\
+            .join(Area, House.area_id == Area.id).join(User, House.user_id == User.id).order_by(House.id).all()
+        for start in range(0, len(rows), constants.HOUSE_SEARCH_REBUILD_BATCH):
+            batch = rows[start:start + constants.HOUSE_SEARCH_REBUILD_BATCH]
+            # 一次查询加载本批已有的数据，merge时不再逐条查询
+            HouseSearch.query.filter(HouseSearch.id.in_([house.id for house, _, _ in batch])).all()
+            for house, area_name, user_avatar_url in batch:
+                db.session.merge(HouseSearch.from_house(house, area_name, user_avatar_url))
+            db.session.commit()
+        HouseSearch.query.filter(~HouseSearch.id.in_(db.session.query(House.id)))\
+            .delete(synchronize_session=False)
+        db.session.commit()
+        return len(rows)
+
+    def to_basic_dict(self):
+        """将基本信息转换为字典数据，与House.to_basic_dict的数据格式相同"""
+        house_dict = {
+            "house_id": self.id,
+            "title": self.title,
+            "price": self.price,
+            "area_name": self.area_name,
+            "img_url": image_url(self.index_image_url, "medium"),
+            "img_webp_url": image_webp_url(self.index_image_url, "medium"),
+            "room_count": self.room_count,
+            "order_count": self.order_count,
+            "address": self.address,
+            "user_avatar": image_url(self.user_avatar_url, "thumb"),
+            "ctime": self.create_time.strftime("%Y-%m-%d")
+        }
+        return house_dict
@@ -14,73 +14,153 @@ function getCookie(name) {
     return r ? r[1] : undefined;
 }
 
+// 不能使用订单推送时，重新查询订单列表的间隔，单位：毫秒
+var ORDERS_POLL_INTERVAL = 30000;
+var next_cursor = "";  // 下一页订单的游标，为空表示没有更多订单
+var orders_querying = true;  // 是否正在向后台获取订单
+
+// 查询房东的订单
+// action=renew 代表清空列表重新展示第一页，action=refresh 代表只更新第一页中的订单，默认追加下一页
+function loadOrders(action) {
+    var params = {role:"landlord"};
+    if (!action) params.c = next_cursor;
+    $.get("/api/v1.0/user/orders", params, function(data){
+        if ("refresh" != action) orders_querying = false;
+        if ("0" == data.errno) {
+            var orders = data.data.orders;
+            if ("refresh" == action) {
+                // 从较早的订单开始更新，列表中没有的订单依次插入到最前面
+                for (var i=orders.length-1; i>=0; i--) {
+                    updateOrder(orders[i]);
+                }
+                return;
+            }
+            next_cursor = data.data.next;
+            if ("renew" == action) {
+                $(".orders-list").html(template("orders-list-tmpl", {orders:orders}));
+            } else if (orders.length) {
+                $(".orders-list").append(template("orders-list-tmpl", {orders:orders}));
+            }
+        }
+    });
+}
+
+// 定时重新查询第一页订单
+function pollOrders() {
+    setInterval(function(){
+        loadOrders("refresh");
+    }, ORDERS_POLL_INTERVAL);
+}
+
+// 推送的订单发生变化时只更新这一个订单，列表中还没有的订单插入到最前面
+function updateOrder(order) {
+    var html = template("orders-list-tmpl", {orders:[order]});
+    var $order = $(".orders-list>li[order-id="+ order.order_id +"]");
+    if ($order.length) {
+        $order.replaceWith(html);
+    } else {
+        if (!$(".orders-list>li").length) $(".orders-list").empty();
+        $(".orders-list").prepend(html);
+    }
+}
+
+// 接收订单变化的推送，浏览器不支持或者服务端拒绝推送时，改为定时重新查询订单列表
+function watchOrders() {
+    if (!window.EventSource) {
+        pollOrders();
+        return;
+    }
+    var source = new EventSource("/api/v1.0/user/orders/stream?role=landlord");
+    var opened = false;
+    source.onopen = function(){
+        // 断线重连期间的订单变化没有推送，重新查询一次订单列表
+        if (opened) loadOrders("refresh");
+        opened = true;
+    };
+    source.addEventListener("order", function(e){
+        updateOrder(JSON.parse(e.data).order);
+    });
+    source.onerror = function(){
+        if (EventSource.CLOSED == source.readyState) {
+            pollOrders();
+        }
+    };
+}
+
 $(document).ready(function(){
     $('.modal').on('show.bs.modal', centerModals);      //当模态框出现的时候
     $(window).on('resize', centerModals);
-    // 查询房东的订单
-    $.get("/api/v1.0/user/orders?role=landlord", function(data){
-        if ("0" == data.errno) {
-            $(".orders-list").html(template("orders-list-tmpl", {orders:data.orders}));
-            $(".order-accept").on("click", function(){
-                var orderId = $(this).parents("li").attr("order-id");
-                $(".modal-accept").attr("order-id", orderId);
-            });
-            // 接单处理
-            $(".modal-accept").on("click", function(){
-                var orderId = $(this).attr("order-id");
-                $.ajax({
-                    url:"/api/v1.0/orders/"+orderId+"/status",
-                    type:"POST",
-                    data:'{"action":"accept"}',
-                    contentType:"application/json",
-                    dataType:"json",
-                    headers:{
-                        "X-XSRFTOKEN":getCookie("_xsrf"),
-                    },
-                    success:function (data) {
-                        if ("4101" == data.errno) {
-                            location.href = "/login.html";
-                        } else if ("0" == data.errno) {
-                            $(".orders-list>li[order-id="+ orderId +"]>div.order-content>div.order-text>ul li:eq(4)>span").html("已接单");
-                            $("ul.orders-list>li[order-id="+ orderId +"]>div.order-title>div.order-operate").hide();
-                            $("#accept-modal").modal("hide");
-                        }
-                    }
-                })
-            });
-            $(".order-reject").on("click", function(){
-                var orderId = $(this).parents("li").attr("order-id");
-                $(".modal-reject").attr("order-id", orderId);
-            });
-            // 处理拒单
-            $(".modal-reject").on("click", function(){
-                var orderId = $(this).attr("order-id");
-                var reject_reason = $("#reject-reason").val()
-                if (!reject_reason) return;
-                var data = {
-                    action: "reject",
-                    reject_reason:reject_reason
-                };
-                $.ajax({
-                    url:"/api/v1.0/orders/"+orderId+"/status",
-                    type:"POST",
-                    data:JSON.stringify(data),
-                    contentType:"application/json",
-                    headers: {
-                        "X-XSRFTOKEN":getCookie("_xsrf"),
-                    },
-                    dataType:"json",
-                    success:function (data) {
-                        if ("4101" == data.errno) {
-                            location.href = "/login.html";
-                        } else if ("0" == data.errno) {
-                            $(".orders-list>li[order-id="+ orderId +"]>div.order-content>div.order-text>ul li:eq(4)>span").html("已拒单");
-                            $("ul.orders-list>li[order-id="+ orderId +"]>div.order-title>div.order-operate").hide();
-                            $("#reject-modal").modal("hide");
-                        }
-                    }
-                });
-            })
+    loadOrders("renew");
+    watchOrders();
+    // 滚动到接近页面底部时，加载下一页订单
+    var windowHeight = $(window).height();
+    window.onscroll = function(){
+        var b = document.documentElement.scrollTop==0? document.body.scrollTop : document.documentElement.scrollTop;
+        var c = document.documentElement.scrollTop==0? document.body.scrollHeight : document.documentElement.scrollHeight;
+        if (c-b<windowHeight+50 && !orders_querying && next_cursor) {
+            orders_querying = true;
+            loadOrders();
         }
+    };
+    // 订单列表会被推送更新，在列表上绑定事件
+    $(".orders-list").on("click", ".order-accept", function(){
+        var orderId = $(this).parents("li").attr("order-id");
+        $(".modal-accept").attr("order-id", orderId);
+    });
+    // 接单处理
+    $(".modal-accept").on("click", function(){
+        var orderId = $(this).attr("order-id");
+        $.ajax({
+            url:"/api/v1.0/orders/"+orderId+"/status",
+            type:"POST",
+            data:'{"action":"accept"}',
+            contentType:"application/json",
+            dataType:"json",
+            headers:{
+                "X-XSRFTOKEN":getCookie("_xsrf"),
+            },
+            success:function (data) {
+                if ("4101" == data.errno) {
+                    location.href = "/login.html";
+                } else if ("0" == data.errno) {
+                    $(".orders-list>li[order-id="+ orderId +"]>div.order-content>div.order-text>ul li:eq(4)>span").html("已接单");
+                    $("ul.orders-list>li[order-id="+ orderId +"]>div.order-title>div.order-operate").hide();
+                    $("#accept-modal").modal("hide");
+                }
+            }
+        })
+    });
+    $(".orders-list").on("click", ".order-reject", function(){
+        var orderId = $(this).parents("li").attr("order-id");
+        $(".modal-reject").attr("order-id", orderId);
     });
+    // 处理拒单
+    $(".modal-reject").on("click", function(){
+        var orderId = $(this).attr("order-id");
+        var reject_reason = $("#reject-reason").val()
+        if (!reject_reason) return;
+        var data = {
+            action: "reject",
+            reject_reason:reject_reason
+        };
+        $.ajax({
+            url:"/api/v1.0/orders/"+orderId+"/status",
+            type:"POST",
+            data:JSON.stringify(data),
+            contentType:"application/json",
+            headers: {
+                "X-XSRFTOKEN":getCookie("_xsrf"),
+            },
+            dataType:"json",
+            success:function (data) {
+                if ("4101" == data.errno) {
+                    location.href = "/login.html";
+                } else if ("0" == data.errno) {
+                    $(".orders-list>li[order-id="+ orderId +"]>div.order-content>div.order-text>ul li:eq(4)>span").html("已拒单");
+                    $("ul.orders-list>li[order-id="+ orderId +"]>div.order-title>div.order-operate").hide();
+                    $("#reject-modal").modal("hide");
+                }
+            }
+        });
+    })
 });
\ No newline at end of file
@@ -1,3 +1,17 @@
+// 图片在后台上传，轮询上传状态，上传完成后使用存储后端中的图片地址替换预览地址
+function waitUploaded(uploadId, callback) {
+    $.get("/api/v1.0/uploads/" + uploadId + "/status", function (resp) {
+        if ("0" != resp.errno || "failed" == resp.data.status) {
+            return;
+        }
+        if ("done" == resp.data.status) {
+            callback(resp.data.url);
+        } else {
+            setTimeout(function () { waitUploaded(uploadId, callback); }, 1000);
+        }
+    }, "json");
+}
+
 function getCookie(name) {
     var r = document.cookie.match("\\b" + name + "=([^;]*)\\b");
     return r ? r[1] : undefined;
@@ -84,8 +98,12 @@ $(document).ready(function(){
                 if ("4101" == resp.errno) {
                     location.href = "/login.html";
                 } else if ("0" == resp.errno) {
-                    // 在前端中添加一个img标签，展示上传的图片
-                    $(".house-image-cons").append('<img src="'+ resp.data.url+'">');
+                    // 在前端中添加一个img标签，展示上传的图片，上传完成后替换为存储后端中的图片地址
+                    var img = $('<img src="'+ resp.data.url+'">');
+                    $(".house-image-cons").append(img);
+                    waitUploaded(resp.data.upload_id, function (url) {
+                        img.attr("src", url);
+                    });
                 } else {
                     alert(resp.errmsg);
                 }
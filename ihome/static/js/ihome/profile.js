@@ -6,6 +6,20 @@ function showSuccessMsg() {
     });
 }
 
+// 图片在后台上传，轮询上传状态，上传完成后使用存储后端中的图片地址替换预览地址
+function waitUploaded(uploadId, callback) {
+    $.get("/api/v1.0/uploads/" + uploadId + "/status", function (resp) {
+        if ("0" != resp.errno || "failed" == resp.data.status) {
+            return;
+        }
+        if ("done" == resp.data.status) {
+            callback(resp.data.url);
+        } else {
+            setTimeout(function () { waitUploaded(uploadId, callback); }, 1000);
+        }
+    }, "json");
+}
+
 function getCookie(name) {
     var r = document.cookie.match("\\b" + name + "=([^;]*)\\b");
     return r ? r[1] : undefined;
@@ -40,8 +54,11 @@ $(document).ready(function () {
             dataType: "json",
             success: function (resp) {
                 if (resp.errno == "0") {
-                    // 表示上传成功， 将头像图片的src属性设置为图片的url
+                    // 表示上传成功， 将头像图片的src属性设置为图片的url，上传完成后替换为存储后端中的图片地址
                     $("#user-avatar").attr("src", resp.data.avatar_url);
+                    waitUploaded(resp.data.upload_id, function (url) {
+                        $("#user-avatar").attr("src", url);
+                    });
                 } else if (resp.errno == "4101") {
                     // 表示用户未登录，跳转到登录页面
                     location.href = "/login.html";
@@ -0,0 +1,185 @@
+# -*- coding:utf-8 -*-
+
+import uuid
+import datetime
+import threading
+
+from flask import current_app
+from ihome import db, redis_store, constants
+from ihome.models import Order
+
+
+# 房屋预订日期索引：每一天对应一个redis集合，集合中保存当天已被预订的房屋编号
+# 例如 house_booked_20170901 --> {1, 5, 8}
+BOOKED_DAY_KEY = "house_booked_%s"
+# 索引是否已经完整建立的标记，未建立时搜索直接查询mysql
+BOOKED_READY_KEY = "house_booked_ready"
+# 重建索引的锁，多个进程同时发现索引未建立时，只有一个进程在后台重建
+BOOKED_REBUILD_LOCK_KEY = "house_booked_rebuild_lock"
+# 日期搜索时在redis中计算的已预订房屋并集，每次搜索一个临时键，统计数量后立即删除
+BOOKED_UNION_KEY = "house_booked_union_%s"
+
+
+def _to_date(value):
+    """把datetime转换为date，只保留日期部分"""
+    return datetime.date(value.year, value.month, value.day)
+
+
+def _iter_days(begin_date, end_date):
+    """遍历起止日期之间（包含两端）的每一天"""
+    day = _to_date(begin_date)
+    end = _to_date(end_date)
+    while day <= end:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+def _add_days(pipe, house_id, begin_date, end_date):
+    """把房屋在起止日期内的每一天加入索引，过期日期的数据由redis自动清理"""
+    for day in _iter_days(begin_date, end_date):
+        key = BOOKED_DAY_KEY % day.strftime("%Y%m%d")
+        pipe.sadd(key, house_id)
+        expire_at = day + datetime.timedelta(days=constants.HOUSE_BOOKED_REDIS_KEEP_DAYS)
+        pipe.expireat(key, datetime.datetime(expire_at.year, expire_at.month, expire_at.day))
+
+
+def mark_booked(house_id, begin_date, end_date):
+    """新订单生成后，把房屋的预订日期写入索引"""
+    try:
+        pipe = redis_store.pipeline()
+        _add_days(pipe, house_id, begin_date, end_date)
+        pipe.execute()
+    except Exception as e:
+        current_app.logger.error(e)
+        # 写入失败时删除索引建立标记，后续搜索回退到mysql查询，避免返回错误的结果
+        _invalidate()
+
+
+def release(house_id, begin_date, end_date):
+    """订单被拒绝或取消后，释放房屋的预订日期"""
+    try:
+        # 同一房屋在这段日期内可能还有其他有效订单，需要重新写回
+        other_orders = db.session.query(Order.begin_date, Order.end_date)\
+            .filter(Order.house_id == house_id, Order.begin_date <= end_date, Order.end_date >= begin_date,
+                    Order.status.notin_(constants.ORDER_INACTIVE_STATUS)).all()
+        pipe = redis_store.pipeline()
+        for day in _iter_days(begin_date, end_date):
+            pipe.srem(BOOKED_DAY_KEY % day.strftime("%Y%m%d"), house_id)
+        for other_begin, other_end in other_orders:
+            _add_days(pipe, house_id, max(begin_date, other_begin), min(end_date, other_end))
+        pipe.execute()
+    except Exception as e:
+        current_app.logger.error(e)
+        _invalidate()
+
+
+def _invalidate():
+    """删除索引建立标记"""
+    try:
+        redis_store.delete(BOOKED_READY_KEY)
+    except Exception as e:
+        current_app.logger.error(e)
+
+
+def _get_booked_from_index(start_date, end_date):
+    """
+    通过索引的集合运算查询起止日期内已被预订的房屋编号，并集在redis中计算（SUNIONSTORE），
+    只有数量不超过HOUSE_BOOKED_EXCLUDE_MAX时才取回编号；索引不可用或数量超过限制时返回None
+    """
+    if (end_date - start_date).days + 1 > constants.HOUSE_BOOKED_SEARCH_MAX_DAYS:
+        return None
+    keys = [BOOKED_DAY_KEY % day.strftime("%Y%m%d") for day in _iter_days(start_date, end_date)]
+    union_key = BOOKED_UNION_KEY % uuid.uuid4().hex
+    try:
+        pipe = redis_store.pipeline()
+        pipe.exists(BOOKED_READY_KEY)
+        pipe.sunionstore(union_key, keys)
+        pipe.expire(union_key, constants.HOUSE_BOOKED_UNION_EXPIRES)
+        ready, count, _ = pipe.execute()
+        fetch = ready and count <= constants.HOUSE_BOOKED_EXCLUDE_MAX
+        pipe = redis_store.pipeline()
+        if fetch:
+            pipe.smembers(union_key)
+        pipe.delete(union_key)
+        result = pipe.execute()
+    except Exception as e:
+        current_app.logger.error(e)
+        return None
+    if not ready:
+        _schedule_rebuild()
+        return None
+    if not fetch:
+        return None
+    return [int(house_id) for house_id in result[0]]
+
+
+def get_conflict_house_ids(start_date=None, end_date=None):
+    """
+    查询与用户选择的日期冲突的房屋编号，起止日期都有、索引可用并且冲突的房屋不超过HOUSE_BOOKED_EXCLUDE_MAX个时返回编号列表，
+    否则返回None，由conflict_clause在mysql中通过订单表排除，不向mysql传递过长的编号列表
+    """
+    if start_date and end_date:
+        return _get_booked_from_index(start_date, end_date)
+    return None
+
+
+def conflict_clause(house_id_column, start_date=None, end_date=None):
+    """房屋在用户选择的日期内存在有效订单的条件（EXISTS关联子查询），每个房屋通过订单表的house_id_dates索引检查"""
+    filter_params = [Order.house_id == house_id_column, Order.status.notin_(constants.ORDER_INACTIVE_STATUS)]
+    if end_date:
+        filter_params.append(Order.begin_date <= end_date)
+    if start_date:
+        filter_params.append(Order.end_date >= start_date)
+    return db.session.query(Order.id).filter(*filter_params).exists()
+
+
+def _rebuild_in_background(app):
+    """后台线程中重建索引"""
+    with app.app_context():
+        try:
+            rebuild()
+        except Exception as e:
+            app.logger.error(e)
+        finally:
+            db.session.remove()
+
+
+def _schedule_rebuild():
+    """
+    索引未建立（首次部署、redis数据丢失或索引写入失败）时，在后台线程中自动重建，重建完成前搜索回退到mysql
+    重建锁在有效期内不删除，重建失败时也不会频繁重试
+    """
+    try:
+        if not redis_store.set(BOOKED_REBUILD_LOCK_KEY, 1, nx=True, ex=constants.HOUSE_BOOKED_REBUILD_LOCK_EXPIRES):
+            return
+    except Exception as e:
+        current_app.logger.error(e)
+        return
+    thread = threading.Thread(target=_rebuild_in_background, args=(current_app._get_current_object(),),
+                              name="house-booked-rebuild")
+    thread.daemon = True
+    thread.start()
+
+
+def rebuild():
+    """根据mysql中的有效订单，重新建立整个房屋预订日期索引"""
+    # 先删除建立标记，重建期间的搜索全部回退到mysql
+    redis_store.delete(BOOKED_READY_KEY)
+    old_keys = list(redis_store.scan_iter(BOOKED_DAY_KEY % "*"))
+    if old_keys:
+        redis_store.delete(*old_keys)
+    # 只需要重建仍在保留期内的订单
+    since = datetime.date.today() - datetime.timedelta(days=constants.HOUSE_BOOKED_REDIS_KEEP_DAYS)
+    orders = db.session.query(Order.house_id, Order.begin_date, Order.end_date)\
+        .filter(Order.end_date >= since, Order.status.notin_(constants.ORDER_INACTIVE_STATUS))\
+        .yield_per(1000)
+    pipe = redis_store.pipeline()
+    count = 0
+    for house_id, begin_date, end_date in orders:
+        _add_days(pipe, house_id, max(_to_date(begin_date), since), end_date)
+        count += 1
+        if count % 1000 == 0:
+            pipe.execute()
+    pipe.set(BOOKED_READY_KEY, 1)
+    pipe.execute()
+    return count
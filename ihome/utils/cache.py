@@ -0,0 +1,325 @@
+# -*- coding:utf-8 -*-
+
+import os
+import math
+import time
+import random
+import hashlib
+import binascii
+import logging
+import threading
+import collections
+
+from flask import current_app, request
+from redis import WatchError
+from ihome import redis_store, constants
+
+
+# 房屋列表缓存的版本号（generation），版本号是缓存键的一部分，
+# 数据变化时只需要把对应的版本号加1，旧版本的缓存不会再被读取，等待过期即可，不需要扫描删除缓存键
+# 不限区域的房屋列表
+HOUSES_GEN_ALL = "houses_gen_all"
+# 指定区域的房屋列表
+HOUSES_GEN_AREA = "houses_gen_area_%s"
+# 指定入住日期的房屋列表，按月份划分
+HOUSES_GEN_MONTH = "houses_gen_month_%s"
+# 所有指定了日期的房屋列表，用于只有单侧日期、或日期跨度过大的搜索
+HOUSES_GEN_DATES = "houses_gen_dates"
+# 按月份划分版本号时，搜索日期最多跨越的月份数
+HOUSES_GEN_MAX_MONTHS = 12
+
+
+def _iter_months(begin_date, end_date):
+    """遍历起止日期之间（包含两端）的每个月份，例如 201709"""
+    year, month = begin_date.year, begin_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield "%04d%02d" % (year, month)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _date_gen_keys(start_date, end_date):
+    """房屋列表搜索条件中的日期所依赖的版本号"""
+    if not (start_date or end_date):
+        return []
+    if start_date and end_date:
+        months = list(_iter_months(start_date, end_date))
+        if len(months) <= HOUSES_GEN_MAX_MONTHS:
+            return [HOUSES_GEN_MONTH % month for month in months]
+    return [HOUSES_GEN_DATES]
+
+
+def get_houses_list_key(area_id, start_date, end_date, sort_key):
+    """
+    生成房屋列表缓存的键，键中包含搜索条件所依赖的全部版本号，一次MGET获取
+    例如 houses_1_2017-09-01_2017-09-03_new_3.5
+    """
+    gen_keys = [HOUSES_GEN_AREA % area_id if area_id else HOUSES_GEN_ALL] + _date_gen_keys(start_date, end_date)
+    gens = redis_store.mget(gen_keys)
+    return "houses_%s_%s_%s_%s_%s" % (area_id,
+                                      start_date.strftime("%Y-%m-%d") if start_date else "",
+                                      end_date.strftime("%Y-%m-%d") if end_date else "",
+                                      sort_key,
+                                      ".".join(gen or "0" for gen in gens))
+
+
+def bump_houses_area(area_id):
+    """房屋信息变化（发布房屋、设置主图片、成交量变化）后，使该区域及不限区域的房屋列表缓存失效"""
+    try:
+        pipe = redis_store.pipeline()
+        pipe.incr(HOUSES_GEN_AREA % area_id)
+        pipe.incr(HOUSES_GEN_ALL)
+        pipe.execute()
+    except Exception as e:
+        current_app.logger.error(e)
+
+
+def bump_houses_dates(begin_date, end_date):
+    """订单占用或释放房屋日期后，使日期与之相关的房屋列表缓存失效"""
+    try:
+        pipe = redis_store.pipeline()
+        pipe.incr(HOUSES_GEN_DATES)
+        for month in _iter_months(begin_date, end_date):
+            pipe.incr(HOUSES_GEN_MONTH % month)
+        pipe.execute()
+    except Exception as e:
+        current_app.logger.error(e)
+
+
+def read_through(key, expires, loader):
+    """带击穿保护的读缓存，只返回缓存数据，详见read_through_entry"""
+    entry = read_through_entry(key, expires, loader)
+    return entry[0] if entry else None
+
+
+def read_through_entry(key, expires, loader):
+    """
+    带击穿保护的读缓存，返回(缓存数据, ETag)，没有数据时返回None
+    缓存使用redis哈希保存：value缓存数据，etag数据的摘要，delta上次重建耗时，expiry逻辑过期时间；
+    缓存的实际有效期比逻辑过期时间多出CACHE_STALE_SECONDS，在此期间由一个进程持锁重建，其他进程继续返回旧数据；
+    临近过期时按概率提前重建（重建越慢、越接近过期，提前重建的概率越大），避免热点缓存同时过期；
+    缓存不存在时也只有一个进程查询mysql，其他进程等待重建结果。
+    loader用来从mysql中查询数据，返回None表示没有数据，不进行缓存；loader中的异常会抛给调用者
+    """
+    try:
+        value, etag, delta, expiry = redis_store.hmget(key, "value", "etag", "delta", "expiry")
+    except Exception as e:
+        current_app.logger.error(e)
+        return _make_entry(loader())
+
+    if value is not None:
+        entry = (value, etag or make_etag(value))
+        # 概率提前过期：now - delta * beta * ln(rand) >= expiry 时重建，ln(rand)为负数
+        now = time.time()
+        early = float(delta or 0) * constants.CACHE_EARLY_EXPIRE_BETA * math.log(1.0 - random.random())
+        if now - early < float(expiry or 0):
+            return entry
+        # 需要重建，但已有其他进程在重建，直接返回旧数据
+        lock_token = _acquire_rebuild_lock(key)
+        if not lock_token:
+            return entry
+        try:
+            return _rebuild(key, expires, loader)
+        except Exception as e:
+            # 重建失败时继续返回旧数据
+            current_app.logger.error(e)
+            return entry
+        finally:
+            _release_rebuild_lock(key, lock_token)
+
+    # 缓存不存在，拿到锁的进程负责重建
+    lock_token = _acquire_rebuild_lock(key)
+    if lock_token:
+        try:
+            return _rebuild(key, expires, loader)
+        finally:
+            _release_rebuild_lock(key, lock_token)
+    # 其他进程等待重建结果，超时后自行查询
+    deadline = time.time() + constants.CACHE_REBUILD_WAIT_SECONDS
+    while time.time() < deadline:
+        time.sleep(0.05)
+        try:
+            value, etag = redis_store.hmget(key, "value", "etag")
+        except Exception as e:
+            current_app.logger.error(e)
+            break
+        if value is not None:
+            return value, etag or make_etag(value)
+    return _make_entry(loader())
+
+
+def _rebuild(key, expires, loader):
+    """调用loader查询数据，并把数据、ETag和重建耗时保存到缓存中"""
+    start = time.time()
+    entry = _make_entry(loader())
+    if entry is None:
+        return None
+    now = time.time()
+    try:
+        pipe = redis_store.pipeline()
+        pipe.hmset(key, {"value": entry[0], "etag": entry[1], "delta": now - start, "expiry": now + expires})
+        pipe.expire(key, expires + constants.CACHE_STALE_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        current_app.logger.error(e)
+    return entry
+
+
+def make_etag(value):
+    """根据缓存数据生成ETag"""
+    if isinstance(value, unicode):
+        value = value.encode("utf-8")
+    return hashlib.md5(value).hexdigest()
+
+
+def _make_entry(value):
+    """把loader返回的数据转换为(缓存数据, ETag)"""
+    if value is None:
+        return None
+    return value, make_etag(value)
+
+
+def make_cached_response(body, etag):
+    """
+    直接使用缓存中已生成好的响应报文构造json响应，Content-Length由报文长度决定
+    客户端携带的If-None-Match与ETag一致时，返回不带报文的304响应
+    """
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
+def _acquire_rebuild_lock(key):
+    """
+    获取缓存重建锁，锁到期自动释放，防止进程异常退出后无法重建
+    锁的值为随机令牌，获取成功时返回令牌，释放时用来确认锁仍由自己持有；获取失败时返回None
+    """
+    token = binascii.hexlify(os.urandom(8))
+    try:
+        if not redis_store.set("lock_" + key, token, nx=True, ex=constants.CACHE_REBUILD_LOCK_EXPIRES):
+            return None
+    except Exception as e:
+        # redis不可用时直接重建
+        current_app.logger.error(e)
+    return token
+
+
+def _release_rebuild_lock(key, token):
+    """
+    释放缓存重建锁，只删除自己持有的锁：重建耗时超过锁的有效期时，锁可能已经过期并被其他进程获取
+    使用WATCH保证比较令牌和删除锁之间锁没有被修改
+    """
+    lock_key = "lock_" + key
+    try:
+        with redis_store.pipeline() as pipe:
+            pipe.watch(lock_key)
+            if pipe.get(lock_key) != token:
+                return
+            pipe.multi()
+            pipe.delete(lock_key)
+            pipe.execute()
+    except WatchError:
+        # 比较之后锁被修改，已经不是自己持有的锁
+        pass
+    except Exception as e:
+        current_app.logger.error(e)
+
+
+# 进程内缓存失效通知的redis频道，消息内容为需要失效的缓存键
+LOCAL_CACHE_CHANNEL = "local_cache_invalidate"
+
+
+class LocalCache(object):
+    """进程内的LRU缓存，每条数据带有效期，用于几乎不变的基础数据，命中时不需要访问redis"""
+
+    def __init__(self, max_size, expires):
+        self.max_size = max_size
+        self.expires = expires
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """获取缓存数据，不存在或已过期时返回None"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return None
+            value, expiry = item
+            if expiry < time.time():
+                return None
+            # 重新放到末尾，表示最近使用过
+            self._data[key] = item
+            return value
+
+    def set(self, key, value):
+        """保存缓存数据，超过最大条数时淘汰最久未使用的数据"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, time.time() + self.expires)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """删除缓存数据"""
+        with self._lock:
+            self._data.pop(key, None)
+
+
+local_cache = LocalCache(constants.LOCAL_CACHE_MAX_SIZE, constants.LOCAL_CACHE_EXPIRES)
+# 监听失效通知的线程所属的进程编号，多进程部署时每个进程（fork之后）各自启动监听线程
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _listen_invalidation():
+    """订阅失效通知频道，收到通知后删除本进程中的缓存数据，连接断开后自动重连"""
+    while True:
+        try:
+            pubsub = redis_store.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(LOCAL_CACHE_CHANNEL)
+            for message in pubsub.listen():
+                local_cache.delete(message["data"])
+        except Exception as e:
+            logging.error(e)
+        time.sleep(1)
+
+
+def _ensure_invalidation_listener():
+    """在当前进程中启动监听失效通知的后台线程"""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        thread = threading.Thread(target=_listen_invalidation, name="local-cache-invalidation")
+        thread.daemon = True
+        thread.start()
+        _listener_pid = os.getpid()
+
+
+def read_local(key, loader):
+    """
+    先读取进程内缓存，未命中时调用loader（通常是read_through读取redis缓存）获取数据，再保存到进程内缓存中
+    loader返回None表示没有数据，不进行缓存
+    """
+    _ensure_invalidation_listener()
+    value = local_cache.get(key)
+    if value is None:
+        value = loader()
+        if value is not None:
+            local_cache.set(key, value)
+    return value
+
+
+def invalidate_local(*keys):
+    """通知所有进程删除进程内缓存中的数据，同时删除redis中的缓存"""
+    for key in keys:
+        local_cache.delete(key)
+    pipe = redis_store.pipeline()
+    pipe.delete(*keys)
+    for key in keys:
+        pipe.publish(LOCAL_CACHE_CHANNEL, key)
+    pipe.execute()
@@ -13,6 +13,9 @@ from PIL import ImageFilter
 from PIL.ImageDraw import Draw
 from PIL.ImageFont import truetype
 
+# 字符遮罩的亮度查找表，字符图形的灰度放大1.97倍后作为粘贴时的遮罩，预先计算避免每个字符调用256次函数
+MASK_TABLE = [min(255, int(i * 1.97)) for i in range(256)]
+
 
 class Bezier:
     def __init__(self):
@@ -58,6 +61,9 @@ class Captcha(object):
     def __init__(self):
         self._bezier = Bezier()
         self._dir = os.path.dirname(__file__)
+        # 字体对象和渲染好的字符灰度图形，第一次使用时创建，之后重复使用
+        self._fonts = {}
+        self._glyphs = {}
         # self._captcha_path = os.path.join(self._dir, '..', 'static', 'captcha')
 
     @staticmethod
@@ -90,6 +96,25 @@ class Captcha(object):
         Draw(image).rectangle([(0, 0), image.size], fill=self.random_color(238, 255))
         return image
 
+    def font(self, name, size):
+        """获取字体对象，每种字体和字号只加载一次"""
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = truetype(name, size)
+        return font
+
+    def glyph(self, c, name, size):
+        """获取字符的灰度图形（已裁掉空白边缘），每种字体、字号的字符只渲染一次"""
+        key = (c, name, size)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            font = self.font(name, size)
+            glyph = Image.new('L', font.getsize(c), 0)
+            Draw(glyph).text((0, 0), c, font=font, fill=255)
+            glyph = self._glyphs[key] = glyph.crop(glyph.getbbox())
+        return glyph
+
     @staticmethod
     def smooth(image):
         return image.filter(ImageFilter.SMOOTH)
@@ -113,27 +138,26 @@ class Captcha(object):
         width -= dx
         dy = height / 10
         height -= dy
-        draw = Draw(image)
+        # 每个噪点是level+1宽、level高的色块，先算出全部像素，再一次画出
+        block = [(bx, by - level // 2) for bx in xrange(level + 1) for by in xrange(level)]
+        points = []
         for i in xrange(number):
             x = int(random.uniform(dx, width))
             y = int(random.uniform(dy, height))
-            draw.line(((x, y), (x + level, y)), fill=color if color else self._color, width=level)
+            points.extend([(x + bx, y + by) for bx, by in block])
+        Draw(image).point(points, fill=color if color else self._color)
         return image
 
     def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None):
         color = color if color else self._color
-        fonts = tuple([truetype(name, size)
+        fonts = tuple([(name, size)
                        for name in fonts
                        for size in font_sizes or (65, 70, 75)])
-        draw = Draw(image)
         char_images = []
         for c in self._text:
-            font = random.choice(fonts)
-            c_width, c_height = draw.textsize(c, font=font)
-            char_image = Image.new('RGB', (c_width, c_height), (0, 0, 0))
-            char_draw = Draw(char_image)
-            char_draw.text((0, 0), c, font=font, fill=color)
-            char_image = char_image.crop(char_image.getbbox())
+            name, size = random.choice(fonts)
+            # 变形只作用在单通道的字符灰度图形上，粘贴时再使用文字颜色填充
+            char_image = self.glyph(c, name, size)
             for drawing in drawings:
                 d = getattr(self, drawing)
                 char_image = d(char_image)
@@ -144,9 +168,10 @@ class Captcha(object):
                       char_images[-1].size[0]) / 2)
         for char_image in char_images:
             c_width, c_height = char_image.size
-            mask = char_image.convert('L').point(lambda i: i * 1.97)
-            image.paste(char_image,
-                        (offset, int((height - c_height) / 2)),
+            mask = char_image.point(MASK_TABLE)
+            image.paste(color[:3],
+                        (offset, int((height - c_height) / 2),
+                         offset + c_width, int((height - c_height) / 2) + c_height),
                         mask)
             offset += int(c_width * squeeze_factor)
         return image
@@ -161,7 +186,7 @@ class Captcha(object):
         y1 = int(random.uniform(-dy, dy))
         x2 = int(random.uniform(-dx, dx))
         y2 = int(random.uniform(-dy, dy))
-        image2 = Image.new('RGB',
+        image2 = Image.new(image.mode,
                            (width + abs(x1) + abs(x2),
                             height + abs(y1) + abs(y2)))
         image2.paste(image, (abs(x1), abs(y1)))
@@ -178,7 +203,7 @@ class Captcha(object):
         width, height = image.size
         dx = int(random.random() * width * dx_factor)
         dy = int(random.random() * height * dy_factor)
-        image2 = Image.new('RGB', (width + dx, height + dy))
+        image2 = Image.new(image.mode, (width + dx, height + dy))
         image2.paste(image, (dx, dy))
         return image2
 
@@ -219,5 +244,6 @@ class Captcha(object):
 
 captcha = Captcha.instance()
 
+
 if __name__ == '__main__':
     print captcha.generate_captcha()
@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+
+import time
+
+from flask import current_app
+from ihome import redis_store, constants
+from ihome.utils.captcha.captcha import captcha
+
+
+# 预先生成的图片验证码池：redis列表，每个元素为 <验证码内容>:<jpeg图片数据>，每个验证码只使用一次
+CAPTCHA_POOL_KEY = "captcha_pool"
+# 验证码池统计：redis哈希，generated生成数量，requests请求验证码的次数，misses池为空时同步生成的数量，
+# refill_rate最近一次补充时每秒生成的数量；从池中取出的数量为requests - misses
+CAPTCHA_POOL_STATS_KEY = "captcha_pool_stats"
+
+
+def pop_captcha(stats=True):
+    """
+    从验证码池中取出一个验证码，返回(验证码内容, 图片数据)，池为空或redis出错时返回None
+    取出验证码和请求计数在一个管道中发送，只有池为空时才再记录一次未命中；stats为False时不记录统计，只执行LPOP
+    """
+    try:
+        pipe = redis_store.pipeline(transaction=False)
+        pipe.lpop(CAPTCHA_POOL_KEY)
+        if stats:
+            pipe.hincrby(CAPTCHA_POOL_STATS_KEY, "requests", 1)
+        entry = pipe.execute()[0]
+        if not entry and stats:
+            redis_store.hincrby(CAPTCHA_POOL_STATS_KEY, "misses", 1)
+    except Exception as e:
+        current_app.logger.error(e)
+        return None
+    if not entry:
+        return None
+    text, image = entry.split(":", 1)
+    return text, image
+
+
+def refill(pool_size):
+    """补充验证码池，直到池中有pool_size个验证码，每批写入一次redis，返回生成的数量"""
+    count = 0
+    start = time.time()
+    while True:
+        missing = pool_size - redis_store.llen(CAPTCHA_POOL_KEY)
+        if missing <= 0:
+            break
+        pipe = redis_store.pipeline()
+        for i in range(min(missing, constants.CAPTCHA_POOL_REFILL_BATCH)):
+            name, text, image = captcha.generate_captcha()
+            pipe.rpush(CAPTCHA_POOL_KEY, text + ":" + image)
+            count += 1
+        # 多个生成进程同时补充时，池中的数量可能略多于pool_size，截掉多余的验证码
+        pipe.ltrim(CAPTCHA_POOL_KEY, 0, pool_size - 1)
+        pipe.execute()
+    if count:
+        pipe = redis_store.pipeline()
+        pipe.hincrby(CAPTCHA_POOL_STATS_KEY, "generated", count)
+        pipe.hset(CAPTCHA_POOL_STATS_KEY, "refill_rate", "%.1f" % (count / (time.time() - start)))
+        pipe.execute()
+    return count
+
+
+def run_producer(pool_size, interval):
+    """验证码生成进程，每隔interval秒检查一次验证码池，不足时补充"""
+    while True:
+        try:
+            refill(pool_size)
+        except Exception as e:
+            current_app.logger.error(e)
+        time.sleep(interval)
+
+
+def get_pool_stats():
+    """获取验证码池的当前大小和统计数据"""
+    pipe = redis_store.pipeline()
+    pipe.llen(CAPTCHA_POOL_KEY)
+    pipe.hgetall(CAPTCHA_POOL_STATS_KEY)
+    size, stats = pipe.execute()
+    result = {"size": size, "generated": 0, "requests": 0, "misses": 0, "refill_rate": 0.0}
+    for field, value in stats.items():
+        result[field] = float(value) if field == "refill_rate" else int(value)
+    result["served"] = result["requests"] - result["misses"]
+    return result
@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+
+import os
+import hmac
+import time
+import base64
+import hashlib
+import binascii
+
+from flask import current_app
+from ihome import redis_store, constants
+
+
+# 图片验证码令牌：验证码内容不再保存到redis，而是与验证码编号一起用HMAC签名后返回给客户端，
+# 格式为 base64(<签发时间>|<随机数>|<令牌签名>|<验证码签名>)，令牌签名不包含验证码内容，用来确认令牌是服务器签发的，
+# 验证码签名包含验证码内容；校验时只需要在redis中记录已使用的随机数，防止重复使用
+CAPTCHA_TOKEN_COOKIE = "captcha_token"
+# 已使用的令牌随机数，保存到令牌过期为止
+CAPTCHA_NONCE_KEY = "CaptchaNonce_%s"
+
+# 令牌校验结果
+TOKEN_OK = "ok"
+TOKEN_EXPIRED = "expired"
+TOKEN_MISMATCH = "mismatch"
+
+
+def _sign(*parts):
+    """使用SECRET_KEY对各部分内容签名"""
+    message = "|".join(parts).encode("utf-8")
+    return hmac.new(current_app.config["SECRET_KEY"], message, hashlib.sha256).hexdigest()
+
+
+def make_captcha_token(image_code_id, text):
+    """生成图片验证码令牌"""
+    issued_at = str(int(time.time()))
+    nonce = binascii.hexlify(os.urandom(8))
+    token_mac = _sign(image_code_id, issued_at, nonce)
+    text_mac = _sign(image_code_id, text.lower(), issued_at, nonce)
+    return base64.urlsafe_b64encode("|".join([issued_at, nonce, token_mac, text_mac]))
+
+
+def check_captcha_token(token, image_code_id, text):
+    """
+    校验图片验证码令牌，返回TOKEN_OK、TOKEN_EXPIRED（过期、已使用、伪造或格式错误）或TOKEN_MISMATCH（验证码错误）
+    先在本地校验签发时间和令牌签名，伪造的令牌不会访问redis；
+    与保存在redis中的验证码一样，服务器签发的令牌只能校验一次，无论验证码是否正确
+    """
+    try:
+        issued_at, nonce, token_mac, text_mac = base64.urlsafe_b64decode(str(token)).split("|")
+        age = time.time() - int(issued_at)
+    except (TypeError, ValueError, UnicodeEncodeError):
+        return TOKEN_EXPIRED
+    if not 0 <= age < constants.IMAGE_CODE_REDIS_EXPIRES:
+        return TOKEN_EXPIRED
+    if not hmac.compare_digest(_sign(image_code_id, issued_at, nonce), token_mac):
+        return TOKEN_EXPIRED
+    # 记录已使用的随机数，只需保存到令牌过期为止
+    if not redis_store.set(CAPTCHA_NONCE_KEY % nonce, 1, nx=True, ex=int(constants.IMAGE_CODE_REDIS_EXPIRES - age) + 1):
+        return TOKEN_EXPIRED
+    if not hmac.compare_digest(_sign(image_code_id, text.lower(), issued_at, nonce), text_mac):
+        return TOKEN_MISMATCH
+    return TOKEN_OK
+
@@ -1,5 +1,7 @@
 # -*- coding:utf-8 -*-
 
+import json
+import base64
 import functools
 
 from flask import g, session, jsonify
@@ -31,3 +33,15 @@ def login_required(f):
     return wrapper
 
 
+def encode_cursor(values):
+    """把分页的位置信息（排序值、编号等）编码为不透明的游标字符串，用于游标分页"""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":"))).rstrip("=")
+
+
+def decode_cursor(cursor):
+    """解析游标字符串，还原分页的位置信息，格式不正确时抛出异常"""
+    cursor = str(cursor)
+    values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor: %s" % cursor)
+    return values
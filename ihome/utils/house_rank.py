@@ -0,0 +1,71 @@
+# -*- coding:utf-8 -*-
+
+from flask import current_app
+from ihome import db, redis_store, constants
+from ihome.models import House
+
+
+# 首页房屋排行：redis有序集合，成员为有主图片的房屋编号，分数为房屋的成交量
+HOUSE_RANK_KEY = "home_page_rank"
+# 没有任何房屋有主图片时排行为空，redis中不会保存空的有序集合，使用该标记避免每次查询都重新建立排行
+HOUSE_RANK_EMPTY_KEY = "home_page_rank_empty"
+# 首页响应报文的缓存键，排行前几名变化时删除
+HOME_PAGE_RESP_KEY = "home_page_resp"
+
+
+def update_house_rank(house):
+    """房屋成交量变化、或第一次设置主图片后，更新房屋在排行中的分数"""
+    if not house.index_image_url:
+        return
+    try:
+        pipe = redis_store.pipeline()
+        pipe.exists(HOUSE_RANK_KEY)
+        pipe.zadd(HOUSE_RANK_KEY, house.order_count or 0, house.id)
+        pipe.zrevrank(HOUSE_RANK_KEY, house.id)
+        existed, _, rank = pipe.execute()
+        # 排行还未建立时，不能只保存这一个房屋，删除后由首页查询时重新建立
+        if not existed:
+            redis_store.delete(HOUSE_RANK_KEY, HOUSE_RANK_EMPTY_KEY)
+        # 房屋进入首页展示的范围，首页缓存的数据已不准确
+        if not existed or rank < constants.HOME_PAGE_MAX_HOUSES:
+            redis_store.delete(HOME_PAGE_RESP_KEY)
+    except Exception as e:
+        current_app.logger.error(e)
+
+
+def get_top_house_ids(count):
+    """获取成交量最高的房屋编号，排行不存在时从mysql中重新建立，redis出错时直接查询mysql"""
+    try:
+        pipe = redis_store.pipeline()
+        pipe.exists(HOUSE_RANK_KEY)
+        pipe.exists(HOUSE_RANK_EMPTY_KEY)
+        existed, empty = pipe.execute()
+        if not existed:
+            if empty:
+                return []
+            rebuild()
+        return [int(house_id) for house_id in redis_store.zrevrange(HOUSE_RANK_KEY, 0, count - 1)]
+    except Exception as e:
+        current_app.logger.error(e)
+    rows = db.session.query(House.id).filter(House.index_image_url != "", House.index_image_url != None)\
+        .order_by(House.order_count.desc()).limit(count)
+    return [house_id for house_id, in rows]
+
+
+def rebuild():
+    """根据mysql中有主图片的房屋，重新建立整个排行"""
+    rows = db.session.query(House.id, House.order_count)\
+        .filter(House.index_image_url != "", House.index_image_url != None)
+    pipe = redis_store.pipeline()
+    pipe.delete(HOUSE_RANK_KEY)
+    count = 0
+    for house_id, order_count in rows:
+        pipe.zadd(HOUSE_RANK_KEY, order_count or 0, house_id)
+        count += 1
+    # 排行为空时短时间内不再重建
+    if count:
+        pipe.delete(HOUSE_RANK_EMPTY_KEY)
+    else:
+        pipe.setex(HOUSE_RANK_EMPTY_KEY, constants.HOUSE_RANK_EMPTY_EXPIRES, 1)
+    pipe.delete(HOME_PAGE_RESP_KEY)
+    pipe.execute()
@@ -0,0 +1,107 @@
+# -*- coding:utf-8 -*-
+
+import cStringIO
+
+from PIL import Image, features
+from ihome import constants
+from ihome.utils.image_storage import get_backend
+
+
+# 经过处理的图片在存储后端中保存为多个尺寸的版本，mysql中保存的图片名带有前缀，以区别于直接上传原图的旧图片：
+# v1/<编号> 只有jpeg版本，v1w/<编号> 同时有jpeg和webp版本，
+# 各版本的图片名为 <图片名>/<版本>.<格式>，例如 v1w/abc/thumb.jpg、v1w/abc/thumb.webp
+IMAGE_KEY_PREFIX = "v1/"
+IMAGE_WEBP_KEY_PREFIX = "v1w/"
+
+# EXIF方向标记对应的旋转方式，手机拍摄的照片需要按方向标记旋转后再缩放
+EXIF_ORIENTATION_TAG = 274
+EXIF_ORIENTATION_TRANSPOSE = {
+    2: [Image.FLIP_LEFT_RIGHT],
+    3: [Image.ROTATE_180],
+    4: [Image.FLIP_TOP_BOTTOM],
+    5: [Image.ROTATE_270, Image.FLIP_LEFT_RIGHT],
+    6: [Image.ROTATE_270],
+    7: [Image.ROTATE_90, Image.FLIP_LEFT_RIGHT],
+    8: [Image.ROTATE_90],
+}
+
+
+def image_url(image_name, variant):
+    """
+    根据mysql中保存的图片名，获取适合展示场景的图片地址，variant为IMAGE_VARIANTS中的版本名
+    旧图片只有原图，直接返回原图地址
+    """
+    if not image_name:
+        return ""
+    if image_name.startswith(IMAGE_KEY_PREFIX) or image_name.startswith(IMAGE_WEBP_KEY_PREFIX):
+        return get_backend().url("%s/%s.jpg" % (image_name, variant))
+    return get_backend().url(image_name)
+
+
+def image_webp_url(image_name, variant):
+    """获取图片webp版本的地址，图片没有webp版本时返回空字符串，由前端回退到jpeg版本"""
+    if not image_name or not image_name.startswith(IMAGE_WEBP_KEY_PREFIX):
+        return ""
+    return get_backend().url("%s/%s.webp" % (image_name, variant))
+
+
+def _open_image(data):
+    """读取图片，按EXIF方向标记旋转，并转换为RGB模式（透明背景填充为白色）"""
+    image = Image.open(cStringIO.StringIO(data))
+    image.load()
+    try:
+        orientation = (image._getexif() or {}).get(EXIF_ORIENTATION_TAG)
+    except Exception:
+        orientation = None
+    for method in EXIF_ORIENTATION_TRANSPOSE.get(orientation, []):
+        image = image.transpose(method)
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def _encode(image, image_format):
+    """把图片编码为渐进式jpeg或webp"""
+    output = cStringIO.StringIO()
+    if image_format == "jpg":
+        image.save(output, "JPEG", quality=constants.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(output, "WEBP", quality=constants.IMAGE_WEBP_QUALITY)
+    return output.getvalue()
+
+
+def make_variants(data):
+    """
+    把上传的图片缩放为IMAGE_VARIANTS中的各个尺寸，返回(是否有webp版本, {"<版本>.<格式>": 图片数据})
+    缩放保持宽高比，小图片不会放大；图片无法识别时抛出IOError
+    """
+    image = _open_image(data)
+    formats = ["jpg", "webp"] if features.check("webp") else ["jpg"]
+    variants = {}
+    # 从大到小依次缩放，每次在上一个尺寸的基础上缩小，减少重采样的计算量
+    for variant, size in sorted(constants.IMAGE_VARIANTS.items(), key=lambda item: item[1], reverse=True):
+        image = image.copy()
+        image.thumbnail(size, Image.ANTIALIAS)
+        for image_format in formats:
+            variants["%s.%s" % (variant, image_format)] = _encode(image, image_format)
+    return "webp" in formats, variants
+
+
+def store_image(data, storage, name):
+    """
+    生成图片的各个版本并上传，返回保存到mysql中的图片名
+    name为图片编号，同一张图片重试上传时使用相同的编号；图片无法识别时直接上传原图，返回存储后端生成的图片名
+    """
+    try:
+        has_webp, variants = make_variants(data)
+    except IOError:
+        return storage(data)
+    image_name = (IMAGE_WEBP_KEY_PREFIX if has_webp else IMAGE_KEY_PREFIX) + name
+    for file_name, variant_data in variants.items():
+        storage(variant_data, "%s/%s" % (image_name, file_name))
+    return image_name
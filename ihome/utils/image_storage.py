@@ -1,8 +1,19 @@
 # -*- coding: utf-8 -*-
 
+import os
+import time
+import uuid
+import hashlib
 import logging
+import threading
+import cStringIO
 
-from qiniu import Auth, put_data
+import requests
+from flask import send_file, current_app
+from requests.adapters import HTTPAdapter
+from werkzeug.security import safe_join
+from qiniu import Auth, Zone, put_stream
+from ihome import constants
 
 
 # 需要填写你的 Access Key 和 Secret Key
@@ -13,33 +24,182 @@ secret_key = '-9lenw28jU2REojvGkcsEPWk5Nm9V2HIVqb5Nkts'
 bucket_name = 'ihome'
 
 
-def storage(data):
-    """七牛云存储上传文件接口"""
-    if not data:
-        return None
-    try:
+class StorageBackend(object):
+    """图片存储后端接口，由配置STORAGE_BACKEND选择使用的实现"""
+
+    def put_data(self, data, name=None):
+        """保存文件数据，返回保存的文件名；name不指定时由存储后端根据文件内容生成"""
+        raise NotImplementedError
+
+    def url(self, name):
+        """获取文件的访问地址"""
+        raise NotImplementedError
+
+
+class QiniuStorage(StorageBackend):
+    """
+    七牛云存储，进程内长期使用
+    上传凭证缓存到临近过期时才重新生成，表单上传通过连接池复用keep-alive连接，大文件使用分块上传
+    """
+
+    def __init__(self, access_key, secret_key, bucket_name, up_host=None, url_prefix=constants.QINIU_DOMIN_PREFIX):
         # 构建鉴权对象
-        q = Auth(access_key, secret_key)
+        self.auth = Auth(access_key, secret_key)
+        self.bucket_name = bucket_name
+        self.url_prefix = url_prefix
+        # 上传域名，不指定时根据空间所在的区域查询（七牛SDK会缓存查询结果）
+        self._up_host = up_host
+        self._token = None
+        self._token_deadline = 0
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=constants.QINIU_CONNECTION_POOL_SIZE,
+                              pool_maxsize=constants.QINIU_CONNECTION_POOL_SIZE,
+                              max_retries=constants.QINIU_CONNECTION_RETRIES)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def up_host(self):
+        """上传域名"""
+        if self._up_host is None:
+            self._up_host = Zone().get_up_host(self.auth.get_access_key(), self.bucket_name)[0]
+        return self._up_host
+
+    def upload_token(self):
+        """获取上传凭证，凭证不指定文件名，可以上传任意新文件；距离过期不足QINIU_UPLOAD_TOKEN_REFRESH_SECONDS时重新生成"""
+        with self._lock:
+            now = time.time()
+            if self._token is None or now >= self._token_deadline - constants.QINIU_UPLOAD_TOKEN_REFRESH_SECONDS:
+                self._token = self.auth.upload_token(self.bucket_name, expires=constants.QINIU_UPLOAD_TOKEN_EXPIRES)
+                self._token_deadline = now + constants.QINIU_UPLOAD_TOKEN_EXPIRES
+            return self._token
+
+    def put_data(self, data, name=None):
+        """上传文件数据，返回七牛中保存的文件名；name不指定时由七牛根据文件内容生成"""
+        if len(data) > constants.QINIU_CHUNKED_UPLOAD_THRESHOLD:
+            return self.put_stream(cStringIO.StringIO(data), len(data), name)
+        fields = {"token": self.upload_token()}
+        if name is not None:
+            fields["key"] = name
+        resp = self.session.post(self.up_host + "/", data=fields, files={"file": (name or "file_name", data)},
+                                 timeout=constants.QINIU_UPLOAD_TIMEOUT)
+        if resp.status_code != 200:
+            raise Exception("上传文件到七牛失败 %s %s" % (resp.status_code, resp.text))
+        return resp.json()["key"]
+
+    def put_stream(self, input_stream, data_size, name=None):
+        """分块上传大文件，每次只读取一个4M的块，返回七牛中保存的文件名"""
+        ret, info = put_stream(self.upload_token(), name, input_stream, name or "file_name", data_size)
+        if info is None or info.status_code != 200:
+            raise Exception("上传文件到七牛失败 %s" % info)
+        return ret["key"]
+
+    def url(self, name):
+        """七牛中的文件名就是访问七牛获取文件的路径"""
+        return self.url_prefix + name
+
+
+class LocalStorage(StorageBackend):
+    """
+    本地磁盘存储，用于自行部署以及不依赖网络的测试
+    文件由serve()返回：配置了accel_redirect时交给nginx的internal location发送（X-Accel-Redirect），
+    否则使用send_file，app开启USE_X_SENDFILE时由前端服务器发送，或由WSGI服务器的file_wrapper（sendfile）发送
+    """
+
+    def __init__(self, root, url_prefix, accel_redirect=None):
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix
+        self.accel_redirect = accel_redirect
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+
+    def put_data(self, data, name=None):
+        """保存文件数据，不指定文件名时与七牛一样使用内容摘要作为文件名；先写入临时文件再改名，读取时不会读到写了一半的文件"""
+        if name is None:
+            name = hashlib.sha1(data).hexdigest()
+        path = self.path(name)
+        if path is None:
+            raise ValueError("invalid file name %s" % name)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # 其他线程已创建了该目录
+                pass
+        tmp_path = "%s.%s.tmp" % (path, uuid.uuid4().hex)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.rename(tmp_path, path)
+        return name
 
-        # 生成上传 Token，可以指定过期时间等
-        token = q.upload_token(bucket_name)
+    def url(self, name):
+        return self.url_prefix + name
 
-        # 上传文件
-        ret, info = put_data(token, None, data)
+    def path(self, name):
+        """文件在本地磁盘上的路径，文件名试图访问存储目录之外时返回None"""
+        return safe_join(self.root, name)
 
+    def serve(self, name):
+        """返回文件的响应，文件不存在时返回None；文件名中包含唯一编号，内容不会变化，允许客户端长期缓存"""
+        path = self.path(name)
+        if path is None or not os.path.isfile(path):
+            return None
+        if self.accel_redirect:
+            response = current_app.response_class(mimetype=_guess_mimetype(name))
+            response.headers["X-Accel-Redirect"] = self.accel_redirect + name
+            response.cache_control.public = True
+            response.cache_control.max_age = constants.LOCAL_IMAGE_CACHE_SECONDS
+            return response
+        return send_file(path, conditional=True, cache_timeout=constants.LOCAL_IMAGE_CACHE_SECONDS,
+                         mimetype=_guess_mimetype(name))
+
+
+def _guess_mimetype(name):
+    """根据文件扩展名获取图片的Content-Type，没有扩展名（直接上传的原图）时按jpeg处理"""
+    extension = os.path.splitext(name)[1].lower()
+    return {".png": "image/png", ".gif": "image/gif", ".webp": "image/webp"}.get(extension, "image/jpeg")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def init_storage(app):
+    """根据app配置创建进程内共用的存储后端，STORAGE_BACKEND为qiniu（默认）或local"""
+    global _backend
+    if app.config.get("STORAGE_BACKEND", "qiniu") == "local":
+        _backend = LocalStorage(app.config.get("LOCAL_STORAGE_DIR", "media"),
+                                app.config.get("LOCAL_STORAGE_URL_PREFIX", "/api/v1.0/images/"),
+                                app.config.get("LOCAL_STORAGE_ACCEL_REDIRECT"))
+    else:
+        _backend = QiniuStorage(access_key, secret_key, bucket_name)
+
+
+def get_backend():
+    """获取进程内共用的存储后端，没有调用init_storage时使用七牛云存储"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = QiniuStorage(access_key, secret_key, bucket_name)
+    return _backend
+
+
+def storage(data, name=None):
+    """上传文件接口，通过当前的存储后端保存文件，name为保存的图片名，不指定时由存储后端根据文件内容生成"""
+    if not data:
+        return None
+    try:
+        # 返回保存的图片名，通过存储后端的url()获取图片的访问地址
+        return get_backend().put_data(data, name)
     except Exception as e:
         logging.error(e)
         raise e
 
-    if info and info.status_code != 200:
-        raise Exception("上传文件到七牛失败")
-
-    # 返回七牛中保存的图片名，这个图片名也是访问七牛获取图片的路径
-    return ret["key"]
-
 
 if __name__ == '__main__':
     file_name = raw_input("输入上传的文件")
     with open(file_name, "rb") as f:
         storage(f.read())
-
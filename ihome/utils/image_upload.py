@@ -0,0 +1,259 @@
+# -*- coding:utf-8 -*-
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import Queue
+import atexit
+import logging
+import threading
+
+from ihome import db, redis_store, constants
+from ihome.utils.image_storage import storage
+from ihome.utils.image_process import store_image
+
+
+# 上传任务状态的redis键，值为 pending（上传中）、failed（上传失败）或上传成功后云存储中的图片名
+UPLOAD_STATUS_KEY = "image_upload_%s"
+UPLOAD_PENDING = "pending"
+UPLOAD_FAILED = "failed"
+# 图片内容去重索引：redis哈希，字段为上传图片内容的sha1，值为[存储后端中的图片名, 上传的字节数]
+IMAGE_HASH_INDEX_KEY = "image_hash_index"
+# 上传统计：redis哈希，uploads上传次数、bytes_uploaded上传字节数、dedup_hits去重命中次数、bytes_saved去重节省的字节数
+IMAGE_UPLOAD_STATS_KEY = "image_upload_stats"
+
+
+class ImageUploader(object):
+    """
+    图片异步上传
+    视图函数把图片写入本地暂存目录后立即返回上传编号，由后台线程生成各尺寸版本并上传到云存储，失败后按指数退避重试；
+    相同内容的图片只上传一次；上传成功后调用按任务类型注册的处理函数（例如保存房屋图片、用户头像）。
+    任务信息写入暂存目录中的 <上传编号>.json，处理前重命名为 <上传编号>.processing 认领任务，
+    多个进程共用暂存目录时每个任务只被一个进程处理；进程启动时以及空闲时重新加入未认领的任务和认领已超时的任务。
+    进程退出时通知后台线程结束，未处理的任务留在暂存目录中，下次启动时继续处理。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.handlers = {}
+        self._queue = Queue.Queue()
+        self._workers_pid = None
+        self._workers_lock = threading.Lock()
+        self._workers = []
+        self._stopping = threading.Event()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """从app配置中读取暂存目录、后台线程数、重试次数以及上传图片使用的存储函数，暂存目录为相对路径时位于app的instance目录中"""
+        self.app = app
+        self.spool_dir = os.path.join(app.instance_path, app.config.get("IMAGE_UPLOAD_SPOOL_DIR", "spool/images"))
+        self.worker_count = app.config.get("IMAGE_UPLOAD_WORKERS", 4)
+        self.retries = app.config.get("IMAGE_UPLOAD_RETRIES", 3)
+        # 存储函数storage(data, name=None)接收图片数据和图片名、返回图片名，默认使用配置STORAGE_BACKEND选择的存储后端，也可以替换为测试用的假存储
+        self.storage = app.config.get("IMAGE_UPLOAD_STORAGE") or storage
+        # 每个进程（fork之后）处理第一个请求时启动后台线程，并恢复暂存目录中未完成的任务
+        app.before_first_request(self._ensure_workers)
+
+    def register_handler(self, kind, handler):
+        """注册上传成功后的处理函数，handler(image_name, target_id)在app上下文中执行"""
+        self.handlers[kind] = handler
+
+    def submit(self, kind, target_id, data):
+        """把图片写入暂存目录并加入上传队列，返回上传编号"""
+        self._ensure_workers()
+        upload_id = uuid.uuid4().hex
+        image_path = os.path.join(self.spool_dir, upload_id)
+        with open(image_path, "wb") as f:
+            f.write(data)
+        # 任务信息最后写入，任务信息文件存在表示图片已完整写入
+        with open(image_path + ".json", "w") as f:
+            json.dump({"kind": kind, "target_id": target_id}, f)
+        redis_store.setex(UPLOAD_STATUS_KEY % upload_id, constants.IMAGE_UPLOAD_STATUS_REDIS_EXPIRES, UPLOAD_PENDING)
+        self._queue.put(upload_id)
+        return upload_id
+
+    def get_status(self, upload_id):
+        """查询上传状态，返回 pending、failed、上传成功后的图片名，或None（上传编号不存在）"""
+        return redis_store.get(UPLOAD_STATUS_KEY % upload_id)
+
+    def get_spool_path(self, upload_id):
+        """获取还未上传完成的图片在暂存目录中的路径，不存在时返回None"""
+        image_path = os.path.join(self.spool_dir, upload_id)
+        if "/" in upload_id or not os.path.isfile(image_path):
+            return None
+        return image_path
+
+    def _ensure_workers(self):
+        """在当前进程中创建暂存目录、启动后台上传线程，并恢复暂存目录中未完成的任务"""
+        if self._workers_pid == os.getpid():
+            return
+        with self._workers_lock:
+            if self._workers_pid == os.getpid():
+                return
+            if not os.path.isdir(self.spool_dir):
+                os.makedirs(self.spool_dir)
+            self._workers = []
+            for i in range(self.worker_count):
+                thread = threading.Thread(target=self._work, name="image-upload-%s" % i)
+                thread.daemon = True
+                thread.start()
+                self._workers.append(thread)
+            self._workers_pid = os.getpid()
+            # fork出的子进程继承父进程注册的退出函数，只需要注册一次
+            if not self._atexit_registered:
+                atexit.register(self._stop_workers)
+                self._atexit_registered = True
+        self._recover()
+
+    def _stop_workers(self):
+        """
+        进程退出时通知后台线程结束，并等待正在处理的任务完成，最多等待IMAGE_UPLOAD_STOP_TIMEOUT秒，
+        避免后台线程在解释器清理模块之后继续运行而出错
+        """
+        if self._workers_pid != os.getpid():
+            return
+        self._stopping.set()
+        for _ in self._workers:
+            self._queue.put(None)
+        for thread in self._workers:
+            thread.join(constants.IMAGE_UPLOAD_STOP_TIMEOUT)
+
+    def _recover(self):
+        """
+        重新加入暂存目录中未认领的任务；认领超过IMAGE_UPLOAD_CLAIM_STALE_SECONDS没有更新的任务，
+        认领的进程已经退出，把任务改回未认领，重命名成功的进程才能加入队列
+        """
+        stale_before = time.time() - constants.IMAGE_UPLOAD_CLAIM_STALE_SECONDS
+        for file_name in os.listdir(self.spool_dir):
+            path = os.path.join(self.spool_dir, file_name)
+            if file_name.endswith(".processing"):
+                upload_id = file_name[:-len(".processing")]
+                try:
+                    if os.path.getmtime(path) >= stale_before:
+                        continue
+                    os.rename(path, os.path.join(self.spool_dir, upload_id + ".json"))
+                except OSError:
+                    continue
+                self._queue.put(upload_id)
+            elif file_name.endswith(".json"):
+                self._queue.put(file_name[:-len(".json")])
+
+    def _work(self):
+        """后台上传线程，空闲时检查暂存目录中未完成的任务，取到None时结束"""
+        while not self._stopping.is_set():
+            try:
+                upload_id = self._queue.get(timeout=constants.IMAGE_UPLOAD_RECOVER_INTERVAL)
+            except Queue.Empty:
+                try:
+                    self._recover()
+                except Exception as e:
+                    logging.error(e)
+                continue
+            if upload_id is None:
+                break
+            try:
+                with self.app.app_context():
+                    self._process(upload_id)
+            except Exception as e:
+                logging.error(e)
+
+    def _process(self, upload_id):
+        """认领任务，生成图片的各个尺寸版本并上传，失败后按指数退避重试，成功后调用处理函数并删除暂存文件"""
+        image_path = os.path.join(self.spool_dir, upload_id)
+        claim_path = image_path + ".processing"
+        try:
+            # 重命名是原子操作，只有一个进程能认领成功
+            os.rename(image_path + ".json", claim_path)
+        except OSError:
+            # 任务已被其他进程认领或处理完成
+            return
+        try:
+            with open(claim_path) as f:
+                job = json.load(f)
+            with open(image_path, "rb") as f:
+                data = f.read()
+        except (IOError, OSError, ValueError) as e:
+            logging.error(e)
+            job = None
+        image_name = None
+        for attempt in range(self.retries + 1 if job else 0):
+            # 更新认领时间，上传耗时较长时不会被其他进程当作超时任务
+            os.utime(claim_path, None)
+            try:
+                image_name = self._store(data, upload_id)
+                break
+            except Exception as e:
+                logging.error(e)
+                # 最后一次失败后不再等待
+                if attempt < self.retries:
+                    time.sleep(2 ** attempt)
+        if image_name is not None:
+            try:
+                self.handlers[job["kind"]](image_name, job["target_id"])
+            except Exception as e:
+                logging.error(e)
+                image_name = None
+            finally:
+                db.session.remove()
+        redis_store.setex(UPLOAD_STATUS_KEY % upload_id, constants.IMAGE_UPLOAD_STATUS_REDIS_EXPIRES,
+                          image_name or UPLOAD_FAILED)
+        for path in (claim_path, image_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _store(self, data, upload_id):
+        """
+        上传图片前先按内容的sha1查询去重索引，相同的图片（多个房东上传同一张图片、重复提交）直接使用已有的图片名，
+        不再处理和上传；新图片上传完成后加入索引，并记录上传统计
+        """
+        content_hash = hashlib.sha1(data).hexdigest()
+        try:
+            entry = redis_store.hget(IMAGE_HASH_INDEX_KEY, content_hash)
+        except Exception as e:
+            logging.error(e)
+            entry = None
+        if entry:
+            image_name, size = json.loads(entry)
+            try:
+                pipe = redis_store.pipeline()
+                pipe.hincrby(IMAGE_UPLOAD_STATS_KEY, "dedup_hits", 1)
+                pipe.hincrby(IMAGE_UPLOAD_STATS_KEY, "bytes_saved", size)
+                pipe.execute()
+            except Exception as e:
+                logging.error(e)
+            return image_name
+
+        uploaded = [0]
+
+        def counting_storage(image_data, name=None):
+            """统计上传到存储后端的字节数"""
+            uploaded[0] += len(image_data)
+            return self.storage(image_data, name)
+
+        image_name = store_image(data, counting_storage, upload_id)
+        try:
+            pipe = redis_store.pipeline()
+            pipe.hset(IMAGE_HASH_INDEX_KEY, content_hash, json.dumps([image_name, uploaded[0]]))
+            pipe.hincrby(IMAGE_UPLOAD_STATS_KEY, "uploads", 1)
+            pipe.hincrby(IMAGE_UPLOAD_STATS_KEY, "bytes_uploaded", uploaded[0])
+            pipe.execute()
+        except Exception as e:
+            logging.error(e)
+        return image_name
+
+
+def get_upload_stats():
+    """获取图片上传统计，包括去重节省的上传字节数"""
+    stats = dict.fromkeys(["uploads", "bytes_uploaded", "dedup_hits", "bytes_saved"], 0)
+    for field, value in redis_store.hgetall(IMAGE_UPLOAD_STATS_KEY).items():
+        stats[field] = int(value)
+    return stats
+
+
+image_uploader = ImageUploader()
@@ -0,0 +1,158 @@
+# -*- coding:utf-8 -*-
+
+import json
+import time
+import logging
+
+from flask import current_app
+from ihome import redis_store, constants
+from ihome.utils.order_stream import publish_order
+from ihome.utils.reliable_queue import ReliableQueue
+
+
+# 订单事件队列：redis列表，每个元素为json格式的订单事件，由通知进程汇总后通知房东
+ORDER_EVENT_QUEUE_KEY = "order_events"
+# 房东待汇总的订单事件：redis列表，每个房东一个
+ORDER_DIGEST_KEY = "order_digest_%s"
+# 等待发送汇总通知的房东：redis有序集合，成员为房东id，分数为发送汇总通知的时间
+ORDER_DIGEST_DUE_KEY = "order_digest_due"
+
+order_event_jobs = ReliableQueue(ORDER_EVENT_QUEUE_KEY)
+
+# 订单事件类型
+ORDER_CREATED = "created"
+ORDER_ACCEPTED = "accepted"
+ORDER_REJECTED = "rejected"
+ORDER_COMMENTED = "commented"
+
+# 需要通知房东的事件，接单、拒单是房东自己的操作，不通知房东
+LANDLORD_DIGEST_EVENTS = (ORDER_CREATED, ORDER_COMMENTED)
+
+
+def emit_order_event(event, order, house):
+    """
+    订单保存、接单拒单、评价提交事务之后调用，发出订单事件，同时把变化的订单推送给房东和下单用户
+    事件只是通知，发送失败只记录日志，不影响订单操作的结果
+    """
+    data = {
+        "event": event,
+        "order_id": order.id,
+        "house_id": house.id,
+        "house_title": house.title,
+        "landlord_id": house.user_id,
+        "user_id": order.user_id,
+        "status": order.status,
+        "time": int(time.time())
+    }
+    try:
+        pipe = redis_store.pipeline(transaction=False)
+        if event in LANDLORD_DIGEST_EVENTS:
+            pipe.lpush(ORDER_EVENT_QUEUE_KEY, json.dumps(data))
+        publish_order(pipe, event, order, house.user_id)
+        pipe.execute()
+    except Exception as e:
+        current_app.logger.error(e)
+
+
+def make_digest(events):
+    """把房东一段时间内的订单事件汇总为一条通知，同一订单的多个事件只计算一次"""
+    new_orders = set()
+    comments = set()
+    for event in events:
+        if event["event"] == ORDER_CREATED:
+            new_orders.add(event["order_id"])
+        elif event["event"] == ORDER_COMMENTED:
+            comments.add(event["order_id"])
+    return {"new_orders": len(new_orders), "comments": len(comments), "events": events}
+
+
+def sms_sink(landlord_id, digest):
+    """通过短信发送队列（云通讯）通知房东，使用配置的ORDER_DIGEST_SMS_TEMPLATE_ID短信模板"""
+    from ihome.models import User
+    from ihome.utils.sms_queue import enqueue_sms
+    temp_id = current_app.config.get("ORDER_DIGEST_SMS_TEMPLATE_ID")
+    if not temp_id:
+        raise ValueError("ORDER_DIGEST_SMS_TEMPLATE_ID is not configured")
+    user = User.query.get(landlord_id)
+    if user is None:
+        return
+    enqueue_sms(user.mobile, [digest["new_orders"], digest["comments"]], temp_id)
+
+
+def log_sink(landlord_id, digest):
+    """只记录日志、不真正通知房东，用于开发和测试环境"""
+    logging.info("order digest to landlord %s: %s new orders, %s comments"
+                 % (landlord_id, digest["new_orders"], digest["comments"]))
+
+
+SINKS = {"sms": sms_sink, "log": log_sink}
+
+
+def _collect(event):
+    """
+    把订单事件加入房东的待汇总列表，房东没有等待发送的汇总通知时，ORDER_DIGEST_WINDOW秒后发送
+    窗口内的后续事件合并到同一条通知中
+    """
+    landlord_id = event["landlord_id"]
+    pipe = redis_store.pipeline()
+    pipe.rpush(ORDER_DIGEST_KEY % landlord_id, json.dumps(event))
+    pipe.zscore(ORDER_DIGEST_DUE_KEY, landlord_id)
+    _, due = pipe.execute()
+    if due is None:
+        redis_store.zadd(ORDER_DIGEST_DUE_KEY, time.time() + constants.ORDER_DIGEST_WINDOW, landlord_id)
+
+
+def _flush_due(sink):
+    """发送已到时间的汇总通知，zrem成功的进程才能发送，多个通知进程不会重复通知"""
+    for landlord_id in redis_store.zrangebyscore(ORDER_DIGEST_DUE_KEY, 0, time.time(), start=0, num=100):
+        if not redis_store.zrem(ORDER_DIGEST_DUE_KEY, landlord_id):
+            continue
+        key = ORDER_DIGEST_KEY % landlord_id
+        pipe = redis_store.pipeline()
+        pipe.lrange(key, 0, -1)
+        pipe.delete(key)
+        events, _ = pipe.execute()
+        if not events:
+            continue
+        try:
+            sink(int(landlord_id), make_digest([json.loads(event) for event in events]))
+        except Exception as e:
+            logging.error(e)
+            # 通知失败，事件放回待汇总列表，下一个窗口再发送
+            pipe = redis_store.pipeline()
+            pipe.rpush(key, *events)
+            pipe.zadd(ORDER_DIGEST_DUE_KEY, time.time() + constants.ORDER_DIGEST_WINDOW, landlord_id)
+            pipe.execute()
+
+
+def run_worker(sink):
+    """
+    订单通知进程，从订单事件队列中取出事件，按房东汇总后定时发送通知，可以启动多个
+    进程异常退出时正在汇总的事件由其他通知进程重新汇总，同一订单的重复事件在汇总时只计算一次
+    """
+    order_event_jobs.register()
+    reaped_at = 0
+    while True:
+        try:
+            order_event_jobs.heartbeat()
+            if time.time() - reaped_at >= constants.QUEUE_REAP_INTERVAL:
+                order_event_jobs.reap()
+                reaped_at = time.time()
+            _flush_due(sink)
+            item = order_event_jobs.pop(timeout=1)
+        except Exception as e:
+            logging.error(e)
+            time.sleep(1)
+            continue
+        if item is None:
+            continue
+        try:
+            _collect(json.loads(item))
+            order_event_jobs.ack(item)
+        except Exception as e:
+            logging.error(e)
+            try:
+                order_event_jobs.requeue(item)
+            except Exception as e:
+                logging.error(e)
+            time.sleep(1)
@@ -0,0 +1,106 @@
+# -*- coding:utf-8 -*-
+
+import os
+import json
+import time
+import Queue
+import logging
+import threading
+
+from ihome import redis_store, constants
+
+
+# 订单变化推送频道，每个用户按角色各一个：order_stream_landlord_<房东id>、order_stream_custom_<下单用户id>
+ORDER_STREAM_CHANNEL = "order_stream_%s_%s"
+ORDER_STREAM_PATTERN = "order_stream_*"
+
+# 本进程中的推送连接，频道 -> 连接的消息队列集合
+_streams = {}
+_streams_lock = threading.Lock()
+# 订阅推送频道的线程所属的进程编号，多进程部署时每个进程（fork之后）各自启动订阅线程
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def publish_order(pipe, event, order, landlord_id):
+    """把发生变化的订单发布到房东和下单用户的推送频道，pipe为redis管道，由调用者执行"""
+    message = json.dumps({"event": event, "order": order.to_dict()})
+    pipe.publish(ORDER_STREAM_CHANNEL % ("landlord", landlord_id), message)
+    pipe.publish(ORDER_STREAM_CHANNEL % ("custom", order.user_id), message)
+
+
+def _listen_orders():
+    """
+    订阅所有推送频道，把消息分发给本进程中对应的推送连接，连接断开后自动重连
+    每个进程只使用一个redis订阅连接，不随推送连接的数量增加
+    """
+    while True:
+        try:
+            pubsub = redis_store.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(ORDER_STREAM_PATTERN)
+            for message in pubsub.listen():
+                with _streams_lock:
+                    queues = list(_streams.get(message["channel"], ()))
+                for queue in queues:
+                    try:
+                        queue.put_nowait(message["data"])
+                    except Queue.Full:
+                        # 客户端接收过慢，丢弃消息，客户端可以重新获取订单列表
+                        logging.warning("order stream queue full, message dropped")
+        except Exception as e:
+            logging.error(e)
+        time.sleep(1)
+
+
+def _ensure_listener():
+    """在当前进程中启动订阅推送频道的后台线程"""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        thread = threading.Thread(target=_listen_orders, name="order-stream")
+        thread.daemon = True
+        thread.start()
+        _listener_pid = os.getpid()
+
+
+def cooperative():
+    """
+    当前进程是否使用gevent协程运行（socket已被gevent替换）
+    否则每个推送连接会一直占用一个线程或同步工作进程，此时不提供推送，客户端定时重新获取订单列表
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def stream(role, user_id):
+    """
+    Server-Sent Events数据生成器，推送用户的订单变化，空闲时定时发送心跳，客户端断开后注销连接
+    使用gevent协程运行时，等待消息的连接不占用线程
+    """
+    _ensure_listener()
+    channel = ORDER_STREAM_CHANNEL % (role, user_id)
+    queue = Queue.Queue(maxsize=constants.ORDER_STREAM_QUEUE_SIZE)
+    with _streams_lock:
+        _streams.setdefault(channel, set()).add(queue)
+    try:
+        yield "retry: %d\n\n" % (constants.ORDER_STREAM_RETRY_SECONDS * 1000)
+        while True:
+            try:
+                data = queue.get(timeout=constants.ORDER_STREAM_HEARTBEAT_SECONDS)
+            except Queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            yield "event: order\ndata: %s\n\n" % data
+    finally:
+        with _streams_lock:
+            queues = _streams.get(channel)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del _streams[channel]
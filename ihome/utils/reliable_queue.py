@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+
+import os
+import uuid
+import socket
+
+from ihome import redis_store, constants
+
+
+class ReliableQueue(object):
+    """
+    redis列表实现的可靠任务队列，任务至少被处理一次
+    取出任务的同时把任务移入本进程的处理中列表（BRPOPLPUSH），处理完成后再删除；
+    进程异常退出时处理中的任务不会丢失，其他进程发现它的心跳过期后把任务移回队列重新处理
+    """
+
+    def __init__(self, key):
+        self.key = key
+        # 使用队列的进程编号集合
+        self.workers_key = key + "_workers"
+        self.worker_id = None
+
+    def _processing_key(self, worker_id):
+        """进程的处理中列表"""
+        return "%s_processing_%s" % (self.key, worker_id)
+
+    def _heartbeat_key(self, worker_id):
+        """进程的心跳，过期表示进程已退出"""
+        return "%s_heartbeat_%s" % (self.key, worker_id)
+
+    def push(self, item):
+        """加入任务"""
+        redis_store.lpush(self.key, item)
+
+    def register(self):
+        """处理任务的进程启动时调用，生成进程编号并发送第一次心跳"""
+        self.worker_id = "%s:%s:%s" % (socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        redis_store.sadd(self.workers_key, self.worker_id)
+        self.heartbeat()
+
+    def heartbeat(self):
+        """发送心跳，需要在QUEUE_WORKER_HEARTBEAT_EXPIRES秒内重复调用"""
+        redis_store.setex(self._heartbeat_key(self.worker_id), constants.QUEUE_WORKER_HEARTBEAT_EXPIRES, 1)
+
+    def pop(self, timeout=1):
+        """取出一个任务并移入本进程的处理中列表，超时返回None"""
+        return redis_store.brpoplpush(self.key, self._processing_key(self.worker_id), timeout)
+
+    def ack(self, item):
+        """任务处理完成，从处理中列表删除"""
+        redis_store.lrem(self._processing_key(self.worker_id), 1, item)
+
+    def requeue(self, item):
+        """任务处理出错，从处理中列表移回队列"""
+        pipe = redis_store.pipeline()
+        pipe.lpush(self.key, item)
+        pipe.lrem(self._processing_key(self.worker_id), 1, item)
+        pipe.execute()
+
+    def reap(self):
+        """把心跳已过期的进程处理中的任务移回队列，RPOPLPUSH逐个移动，多个进程同时执行也不会重复，返回移回的任务数"""
+        count = 0
+        for worker_id in redis_store.smembers(self.workers_key):
+            if worker_id == self.worker_id or redis_store.exists(self._heartbeat_key(worker_id)):
+                continue
+            while redis_store.rpoplpush(self._processing_key(worker_id), self.key) is not None:
+                count += 1
+            redis_store.srem(self.workers_key, worker_id)
+        return count
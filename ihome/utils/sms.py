@@ -1,6 +1,6 @@
 # -*- coding:utf-8 -*-
 
-from ihome.libs.yuntongxun.CCPRestSDK import REST
+from ihome.libs.yuntongxun.rest_client import CloopenClient
 
 # 说明：主账号，登陆云通讯网站后，可在"控制台-应用"中看到开发者主账号ACCOUNT SID
 _accountSid = '8aaf0708568d4143015697b0f4960888'
@@ -20,26 +20,8 @@ _serverPort = '8883'
 # 说明：REST API版本号保持不变
 _softVersion = '2013-12-26'
 
-# 云通讯官方提供的发送短信代码实例
-# # 发送模板短信
-# # @param to 手机号码
-# # @param datas 内容数据 格式为数组 例如：{'12','34'}，如不需替换请填 ''
-# # @param $tempId 模板Id
-#
-# def sendTemplateSMS(to, datas, tempId):
-#     # 初始化REST SDK
-#     rest = REST(serverIP, serverPort, softVersion)
-#     rest.setAccount(accountSid, accountToken)
-#     rest.setAppId(appId)
-#
-#     result = rest.sendTemplateSMS(to, datas, tempId)
-#     for k, v in result.iteritems():
-#
-#         if k == 'templateSMS':
-#             for k, s in v.iteritems():
-#                 print '%s:%s' % (k, s)
-#         else:
-#             print '%s:%s' % (k, v)
+# 说明：请求超时时间，(建立连接, 读取响应)，单位：秒
+_timeout = (3, 10)
 
 
 class CCP(object):
@@ -49,9 +31,8 @@ class CCP(object):
         # 判断是否存在类属性_instance，_instance是类CCP的唯一对象，即单例
         if not hasattr(CCP, "_instance"):
             cls._instance = super(CCP, cls).__new__(cls, *args, **kwargs)
-            cls._instance.rest = REST(_serverIP, _serverPort, _softVersion)
-            cls._instance.rest.setAccount(_accountSid, _accountToken)
-            cls._instance.rest.setAppId(_appId)
+            cls._instance.rest = CloopenClient(_accountSid, _accountToken, _appId, _serverIP, _serverPort,
+                                               _softVersion, timeout=_timeout)
         return cls._instance
 
     def send_template_sms(self, to, datas, temp_id):
@@ -59,7 +40,8 @@ class CCP(object):
         # @param to 手机号码
         # @param datas 内容数据 格式为数组 例如：{'12','34'}，如不需替换请填 ''
         # @param temp_id 模板Id
-        result = self.rest.sendTemplateSMS(to, datas, temp_id)
+        # 网络错误或超时时抛出异常，由短信发送进程重试
+        result = self.rest.send_template_sms(to, datas, temp_id)
         # 如果云通讯发送短信成功，返回的字典数据result中statuCode字段的值为"000000"
         if result.get("statusCode") == "000000":
             # 返回0 表示发送短信成功
@@ -0,0 +1,123 @@
+# -*- coding:utf-8 -*-
+
+import json
+import time
+import logging
+
+from ihome import redis_store, constants
+from ihome.utils.reliable_queue import ReliableQueue
+
+
+# 短信发送队列：redis列表，每个元素为json格式的短信任务 {"mobile", "datas", "temp_id", "attempts"}
+SMS_QUEUE_KEY = "sms_queue"
+# 等待重试的短信任务：redis有序集合，分数为下次发送的时间
+SMS_RETRY_KEY = "sms_retry"
+# 同一手机号发送间隔的限制，键存在期间不能再向该手机号发送短信
+SMS_MOBILE_LOCK_KEY = "sms_mobile_%s"
+# 全局发送速率计数，每秒一个计数器
+SMS_RATE_KEY = "sms_rate_%s"
+
+sms_jobs = ReliableQueue(SMS_QUEUE_KEY)
+
+
+def throttle_mobile(mobile):
+    """同一手机号在SMS_SEND_INTERVAL秒内只能发送一次短信，允许发送时返回True"""
+    return bool(redis_store.set(SMS_MOBILE_LOCK_KEY % mobile, 1, nx=True, ex=constants.SMS_SEND_INTERVAL))
+
+
+def release_mobile(mobile):
+    """短信没有加入发送队列时解除手机号的发送间隔限制，用户可以立即重新获取"""
+    redis_store.delete(SMS_MOBILE_LOCK_KEY % mobile)
+
+
+def enqueue_sms(mobile, datas, temp_id):
+    """把短信任务加入发送队列，立即返回，由发送进程调用短信平台接口"""
+    job = {"mobile": mobile, "datas": datas, "temp_id": temp_id, "attempts": 0}
+    sms_jobs.push(json.dumps(job))
+
+
+def ccp_sender(mobile, datas, temp_id):
+    """通过云通讯发送短信，发送成功返回True"""
+    from ihome.utils import sms
+    return 0 == sms.CCP().send_template_sms(mobile, datas, temp_id)
+
+
+def log_sender(mobile, datas, temp_id):
+    """只记录日志、不真正发送短信，用于开发和测试环境"""
+    logging.info("sms to %s template %s: %s" % (mobile, temp_id, datas))
+    return True
+
+
+SENDERS = {"ccp": ccp_sender, "log": log_sender}
+
+
+def _acquire_rate():
+    """全局发送速率限制，本秒已发送的数量未超过SMS_GLOBAL_RATE_PER_SECOND时返回True"""
+    key = SMS_RATE_KEY % int(time.time())
+    pipe = redis_store.pipeline()
+    pipe.incr(key)
+    pipe.expire(key, 2)
+    count, _ = pipe.execute()
+    return count <= constants.SMS_GLOBAL_RATE_PER_SECOND
+
+
+def _schedule(job, delay):
+    """把短信任务放入重试集合，delay秒后重新发送"""
+    redis_store.zadd(SMS_RETRY_KEY, time.time() + delay, json.dumps(job))
+
+
+def _move_due_retries():
+    """把已到重试时间的任务移回发送队列，zrem成功的进程才能移动，多个发送进程不会重复发送"""
+    for job in redis_store.zrangebyscore(SMS_RETRY_KEY, 0, time.time(), start=0, num=100):
+        if redis_store.zrem(SMS_RETRY_KEY, job):
+            sms_jobs.push(job)
+
+
+def process_job(job, sender):
+    """发送一条短信，失败后按指数退避重试，超过最大次数后放弃"""
+    if not _acquire_rate():
+        # 超过全局发送速率，下一秒再发送，不计入失败次数
+        _schedule(job, 1)
+        return
+    try:
+        sent = sender(job["mobile"], job["datas"], job["temp_id"])
+    except Exception as e:
+        logging.error(e)
+        sent = False
+    if sent:
+        return
+    job["attempts"] += 1
+    if job["attempts"] < constants.SMS_MAX_ATTEMPTS:
+        _schedule(job, constants.SMS_RETRY_BASE_DELAY * 2 ** (job["attempts"] - 1))
+    else:
+        logging.error("send sms to %s failed after %s attempts" % (job["mobile"], job["attempts"]))
+
+
+def run_worker(sender):
+    """短信发送进程，可以启动多个；进程异常退出时正在发送的短信由其他发送进程重新发送"""
+    sms_jobs.register()
+    reaped_at = 0
+    while True:
+        try:
+            sms_jobs.heartbeat()
+            if time.time() - reaped_at >= constants.QUEUE_REAP_INTERVAL:
+                sms_jobs.reap()
+                reaped_at = time.time()
+            _move_due_retries()
+            item = sms_jobs.pop(timeout=1)
+        except Exception as e:
+            logging.error(e)
+            time.sleep(1)
+            continue
+        if item is None:
+            continue
+        try:
+            process_job(json.loads(item), sender)
+            sms_jobs.ack(item)
+        except Exception as e:
+            logging.error(e)
+            try:
+                sms_jobs.requeue(item)
+            except Exception as e:
+                logging.error(e)
+            time.sleep(1)
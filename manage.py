@@ -1,6 +1,13 @@
 #!/usr/bin/env python
 # -*- coding:utf-8 -*-
 
+import sys
+
+# 使用gevent协程运行服务时，需要在导入其他模块之前替换标准库中的socket、线程等阻塞操作
+if sys.argv[1:2] == ["runserver_gevent"]:
+    from gevent import monkey
+    monkey.patch_all()
+
 from ihome import create_app, db
 from flask_script import Manager
 from flask_migrate import Migrate, MigrateCommand
@@ -13,6 +20,147 @@ manager = Manager(app)
 manager.add_command("db", MigrateCommand)
 
 
+@manager.command
+def rebuild_availability():
+    """根据mysql中的订单数据，重建房屋预订日期索引"""
+    from ihome.utils import availability
+    count = availability.rebuild()
+    print("rebuild house booked index with %s orders" % count)
+
+
+@manager.command
+def reload_reference_data():
+    """修改城区、设施数据后，通知所有进程删除城区、设施信息的缓存"""
+    from ihome.utils.cache import invalidate_local
+    invalidate_local("area_info_resp", "facility_info")
+    print("reference data cache invalidated")
+
+
+@manager.command
+def rebuild_house_rank():
+    """根据mysql中的房屋成交量，重建首页房屋排行"""
+    from ihome.utils import house_rank
+    house_rank.rebuild()
+    print("rebuild home page house rank")
+
+
+@manager.command
+def rebuild_house_search():
+    """根据房屋、区域、用户数据，重建房屋搜索表"""
+    from ihome.models import HouseSearch
+    count = HouseSearch.rebuild()
+    print("rebuild house search table with %s houses" % count)
+
+
+@manager.command
+def image_upload_stats():
+    """查看图片上传统计，包括内容去重节省的上传字节数"""
+    from ihome.utils.image_upload import get_upload_stats
+    stats = get_upload_stats()
+    print("uploads: %(uploads)s, bytes uploaded: %(bytes_uploaded)s, "
+          "dedup hits: %(dedup_hits)s, bytes saved: %(bytes_saved)s" % stats)
+
+
+@manager.option("-n", "--count", dest="count", type=int, default=200, help="request count")
+@manager.option("-l", "--latency", dest="latency", type=float, default=0.0005, help="simulated seconds per query")
+def bench_house_detail(count, latency):
+    """对比改进前后房屋详情没有缓存时的查询耗时（内存sqlite，每条sql语句模拟一次网络往返）"""
+    from tests.benchmarks import bench_house_detail
+    results = bench_house_detail(count, latency)
+    for version in ("before", "after"):
+        print("%s: %.2f ms per request, %.1f queries" % ((version,) + results[version]))
+
+
+@manager.option("-n", "--count", dest="count", type=int, default=200, help="upload count")
+def bench_image_storage(count):
+    """在本机模拟七牛上传接口，测试图片上传的每秒上传次数"""
+    from tests.benchmarks import bench_image_storage
+    old_rate, new_rate = bench_image_storage(count)
+    print("per-call auth: %.1f uploads/s, shared client: %.1f uploads/s" % (old_rate, new_rate))
+
+
+@manager.option("-s", "--size", dest="size", type=int, default=None, help="captcha pool size")
+@manager.option("-i", "--interval", dest="interval", type=float, default=None, help="refill check interval")
+def captcha_producer(size, interval):
+    """预先生成图片验证码，保持验证码池的大小"""
+    from ihome import constants
+    from ihome.utils.captcha_pool import run_producer
+    run_producer(size or constants.CAPTCHA_POOL_SIZE, interval or constants.CAPTCHA_POOL_REFILL_INTERVAL)
+
+
+@manager.option("-t", "--threads", dest="threads", type=int, default=20, help="concurrent bookings per round")
+@manager.option("-r", "--rounds", dest="rounds", type=int, default=10, help="round count")
+def bench_booking(threads, rounds):
+    """并发预订同一房屋的同一日期，检查没有重复预订，并测试每秒处理的预订请求数（需要mysql，不要在生产环境运行）"""
+    from tests.benchmarks import bench_booking
+    rate, booked, order_count = bench_booking(app, threads, rounds)
+    double_bookings = sum(max(count - 1, 0) for count in booked)
+    print("%.1f booking requests/s, %s orders saved, %s double bookings" % (rate, order_count, double_bookings))
+    if booked != [1] * rounds or order_count != rounds:
+        sys.exit(1)
+
+
+@manager.option("-n", "--count", dest="count", type=int, default=200, help="captcha count")
+def bench_captcha(count):
+    """对比改进前后单进程（单核）每秒生成的图片验证码数量"""
+    from tests.benchmarks import bench_captcha
+    old_rate, new_rate = bench_captcha(count)
+    print("before: %.1f captchas/s, after: %.1f captchas/s" % (old_rate, new_rate))
+
+
+@manager.command
+def captcha_pool_stats():
+    """查看验证码池的大小、补充速度以及池为空的次数"""
+    from ihome.utils.captcha_pool import get_pool_stats
+    print("pool size: %(size)s, generated: %(generated)s, served: %(served)s, misses: %(misses)s, "
+          "refill rate: %(refill_rate)s/s" % get_pool_stats())
+
+
+@manager.option("-n", "--count", dest="count", type=int, default=1000, help="check count")
+def bench_captcha_token(count):
+    """比较redis模式和令牌模式校验图片验证码使用的redis命令数和每秒校验次数"""
+    from tests.benchmarks import bench_captcha_token
+    for mode, (commands, rate) in sorted(bench_captcha_token(count).items()):
+        print("%s mode: %.1f redis commands per check, %.1f checks/s" % (mode, commands, rate))
+
+
+@manager.option("-s", "--sender", dest="sender", default=None, help="sms sender: ccp or log")
+def sms_worker(sender):
+    """短信发送进程，从短信队列中取出任务发送，可以启动多个"""
+    from ihome.utils.sms_queue import run_worker, SENDERS
+    run_worker(SENDERS[sender or app.config["SMS_SENDER"]])
+
+
+@manager.option("-s", "--sink", dest="sink", default=None, help="notify sink: sms or log")
+def order_notify_worker(sink):
+    """订单通知进程，按房东汇总订单事件后发送通知，可以启动多个"""
+    from ihome.utils.order_events import run_worker, SINKS
+    sink = sink or app.config["ORDER_NOTIFY_SINK"]
+    if sink == "sms" and not app.config.get("ORDER_DIGEST_SMS_TEMPLATE_ID"):
+        print("ORDER_DIGEST_SMS_TEMPLATE_ID is not configured, use the log sink until the sms template is approved")
+        return
+    run_worker(SINKS[sink])
+
+
+@manager.option("-n", "--count", dest="count", type=int, default=500, help="call count")
+def bench_sms_client(count):
+    """在本机模拟云通讯接口，测试发送模板短信的每秒调用次数"""
+    from tests.benchmarks import bench_sms_client
+    print("%.1f calls/s" % bench_sms_client(count))
+
+
+@manager.option("-H", "--host", dest="host", default="127.0.0.1", help="listen host")
+@manager.option("-p", "--port", dest="port", type=int, default=5000, help="listen port")
+def runserver_gevent(host, port):
+    """
+    使用gevent协程运行服务，每个连接只占用一个协程，订单推送等大量空闲的长连接不会占用线程
+    也可以使用gunicorn的gevent工作模式：gunicorn -k gevent manage:app
+    """
+    from gevent.pywsgi import WSGIServer
+    print("serving on %s:%s" % (host, port))
+    WSGIServer((host, port), app).serve_forever()
+
+
 if __name__ == '__main__':
     manager.run()
 
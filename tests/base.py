@@ -0,0 +1,61 @@
+# -*- coding:utf-8 -*-
+
+import unittest
+import contextlib
+
+from sqlalchemy import event
+
+from ihome import create_app, db
+from ihome.models import Area, User, House
+
+
+class AppTestCase(unittest.TestCase):
+    """使用内存sqlite数据库的测试基类，每个测试用例重新建表"""
+
+    def setUp(self):
+        self.app = create_app("testing")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    @contextlib.contextmanager
+    def count_queries(self):
+        """统计代码块中执行的sql语句，返回语句列表"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db.get_engine(self.app)
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    def make_user(self, index):
+        """创建用户"""
+        user = User(name="user%s" % index, mobile="138%08d" % index, avatar_url="avatar%s" % index)
+        user.password = "123456"
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def make_area(self, name):
+        """创建区域"""
+        area = Area(name=name)
+        db.session.add(area)
+        db.session.commit()
+        return area
+
+    def make_house(self, user, area, **kwargs):
+        """创建房屋"""
+        house = House(user_id=user.id, area_id=area.id, title=kwargs.pop("title", "house"), **kwargs)
+        db.session.add(house)
+        db.session.commit()
+        return house
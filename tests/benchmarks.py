@@ -0,0 +1,392 @@
+# -*- coding:utf-8 -*-
+"""
+性能测试，由manage.py中的bench_*命令调用，tests/test_benchmarks.py使用较少的次数检查能够正常运行
+需要对比的改进前的实现只在这里保留一份副本，运行时的代码中不包含性能测试
+"""
+
+import json
+import time
+import contextlib
+
+from sqlalchemy import event
+
+
+def _baseline_full_dict(house):
+    """改进前的House.to_full_dict：通过关系属性加载图片和设施对象，每条评论再查询一次评论用户"""
+    from ihome import constants
+    from ihome.models import Order
+    from ihome.utils.image_process import image_url
+    house_dict = {
+        "hid": house.id,
+        "user_id": house.user_id,
+        "user_name": house.user.name,
+        "user_avatar": image_url(house.user.avatar_url, "thumb"),
+        "title": house.title,
+        "price": house.price,
+        "address": house.address,
+        "room_count": house.room_count,
+        "acreage": house.acreage,
+        "unit": house.unit,
+        "capacity": house.capacity,
+        "beds": house.beds,
+        "deposit": house.deposit,
+        "min_days": house.min_days,
+        "max_days": house.max_days,
+        "img_urls": [image_url(image.url, "large") for image in house.images],
+        "facilities": [facility.id for facility in house.facilities]
+    }
+    comments = []
+    orders = Order.query.filter(Order.house_id == house.id, Order.status == "COMPLETE", Order.comment != None)\
+        .order_by(Order.update_time.desc()).limit(constants.HOUSE_DETAIL_COMMENT_DISPLAY_COUNTS)
+    for order in orders:
+        comments.append({
+            "comment": order.comment,
+            "user_name": order.user.name if order.user.name != order.user.mobile else "匿名用户",
+            "ctime": order.update_time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+    house_dict["comments"] = comments
+    return house_dict
+
+
+def _create_house_detail_data(comment_count, image_count, facility_count):
+    """创建一个带图片、设施和评论的房屋，每条评论来自不同的用户，返回房屋编号"""
+    import datetime
+    from ihome import db
+    from ihome.models import User, Area, House, Facility, HouseImage, Order
+    # 测试用户不需要登录，直接使用固定的密码摘要，不逐个计算
+    landlord = User(name="landlord", mobile="13900000000", password_hash="bench")
+    area = Area(name="bench")
+    facilities = [Facility(name="facility%s" % i) for i in range(facility_count)]
+    db.session.add_all([landlord, area] + facilities)
+    db.session.flush()
+    house = House(user_id=landlord.id, area_id=area.id, title="bench", price=100, facilities=facilities)
+    db.session.add(house)
+    db.session.flush()
+    db.session.add_all([HouseImage(house_id=house.id, url="image%s" % i) for i in range(image_count)])
+    day = datetime.datetime(2017, 9, 1)
+    for i in range(comment_count):
+        tenant = User(name="tenant%s" % i, mobile="138%08d" % i, password_hash="bench")
+        db.session.add(tenant)
+        db.session.flush()
+        db.session.add(Order(user_id=tenant.id, house_id=house.id, begin_date=day, end_date=day, days=1,
+                             house_price=100, amount=100, status="COMPLETE", comment="comment%s" % i))
+    db.session.commit()
+    return house.id
+
+
+def bench_house_detail(count=200, latency=0.0005, comment_count=30, image_count=10, facility_count=10):
+    """
+    房屋详情在redis中没有缓存时查询并生成json的耗时，对比改进前后的to_full_dict
+    在内存sqlite中创建测试数据，每条sql语句额外等待latency秒，模拟访问mysql的网络往返；
+    每次查询前清空会话，不使用已加载的对象。返回{"before"/"after": (平均毫秒数, 每次的sql语句数)}
+    """
+    from ihome import create_app, db
+    from ihome.models import House
+    app = create_app("testing")
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+        if latency:
+            time.sleep(latency)
+
+    results = {}
+    with app.app_context():
+        db.create_all()
+        try:
+            house_id = _create_house_detail_data(comment_count, image_count, facility_count)
+            engine = db.get_engine(app)
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            try:
+                for version, to_full_dict in [("before", _baseline_full_dict), ("after", House.to_full_dict)]:
+                    del statements[:]
+                    start = time.time()
+                    for i in range(count):
+                        db.session.remove()
+                        json.dumps(to_full_dict(House.query.get(house_id)))
+                    elapsed = time.time() - start
+                    results[version] = (elapsed * 1000 / count, len(statements) / float(count))
+            finally:
+                event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        finally:
+            db.session.remove()
+            db.drop_all()
+    return results
+
+
+def _create_booking_data(tenant_count):
+    """创建测试用的房东、房屋和租客，返回(房东编号, 新建的区域编号或None, 房屋编号, 租客编号列表)"""
+    from ihome import db
+    from ihome.models import User, Area, House
+    stamp = int(time.time()) % 100000
+    landlord = User(name="bench_landlord", mobile="198%05d000" % stamp, password_hash="bench")
+    area = Area.query.first()
+    created_area = None
+    if area is None:
+        area = created_area = Area(name="bench")
+        db.session.add(area)
+    tenants = [User(name="bench_tenant_%s" % i, mobile="199%05d%03d" % (stamp, i), password_hash="bench")
+               for i in range(tenant_count)]
+    db.session.add(landlord)
+    db.session.add_all(tenants)
+    db.session.flush()
+    house = House(user_id=landlord.id, area_id=area.id, title="bench", price=100)
+    db.session.add(house)
+    db.session.commit()
+    return landlord.id, created_area and created_area.id, house.id, [tenant.id for tenant in tenants]
+
+
+def _delete_booking_data(landlord_id, area_id, house_id, tenant_ids, first_day, last_day):
+    """删除测试数据，并从预订日期索引中释放测试房屋"""
+    from ihome import db
+    from ihome.models import User, Area, House, Order
+    from ihome.utils import availability
+    Order.query.filter(Order.house_id == house_id).delete(synchronize_session=False)
+    House.query.filter(House.id == house_id).delete(synchronize_session=False)
+    User.query.filter(User.id.in_(tenant_ids + [landlord_id])).delete(synchronize_session=False)
+    if area_id is not None:
+        Area.query.filter(Area.id == area_id).delete(synchronize_session=False)
+    db.session.commit()
+    availability.release(house_id, first_day, last_day)
+
+
+def bench_booking(app, thread_count=20, rounds=10):
+    """
+    并发预订测试：每一轮由thread_count个不同的租客同时预订同一房屋的同一日期，每一轮应当恰好有一个预订成功
+    直接调用保存订单的视图函数，不经过session存储；测试数据写入app配置的数据库，结束后删除，不要在生产环境运行。
+    需要在app上下文中调用，返回(每秒处理的预订请求数, 每一轮成功的预订数列表, 保存的订单数)
+    房屋行锁（SELECT ... FOR UPDATE）只在mysql等支持行锁的数据库中生效，sqlite中会出现重复预订
+    """
+    import datetime
+    import threading
+    from flask import session
+    from ihome import db
+    from ihome.models import Order
+    landlord_id, area_id, house_id, tenant_ids = _create_booking_data(thread_count)
+    # 使用很远的日期，不与真实订单冲突
+    first_day = datetime.date.today() + datetime.timedelta(days=3650)
+    last_day = first_day + datetime.timedelta(days=rounds - 1)
+    elapsed = 0
+    booked = []
+    try:
+        for i in range(rounds):
+            day = (first_day + datetime.timedelta(days=i)).strftime("%Y-%m-%d")
+            body = json.dumps({"house_id": house_id, "start_date": day, "end_date": day})
+            start_event = threading.Event()
+            results = []
+
+            def book(tenant_id):
+                start_event.wait()
+                with app.test_request_context("/api/v1.0/orders", method="POST", data=body,
+                                              content_type="application/json"):
+                    session["user_id"] = tenant_id
+                    resp = app.make_response(app.dispatch_request())
+                    results.append(json.loads(resp.data)["errno"])
+
+            threads = [threading.Thread(target=book, args=(tenant_id,)) for tenant_id in tenant_ids]
+            for thread in threads:
+                thread.start()
+            start = time.time()
+            start_event.set()
+            for thread in threads:
+                thread.join()
+            elapsed += time.time() - start
+            booked.append(results.count("0"))
+        order_count = Order.query.filter(Order.house_id == house_id).count()
+    finally:
+        db.session.rollback()
+        _delete_booking_data(landlord_id, area_id, house_id, tenant_ids, first_day, last_day)
+    return thread_count * rounds / elapsed, booked, order_count
+
+
+@contextlib.contextmanager
+def stub_http_server(body, headers=None):
+    """在本机启动模拟第三方接口（七牛上传、云通讯短信）的服务，所有POST请求都返回固定的json响应体，返回服务的端口号"""
+    import threading
+    import BaseHTTPServer
+    import SocketServer
+    body = json.dumps(body)
+
+    class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # 响应头和响应体一次写出，避免小包延迟确认影响测试结果
+        wbufsize = -1
+        # 客户端连接池中的空闲连接超时后关闭，退出时不会留下阻塞在读取上的线程
+        timeout = 1
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class StubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+        pass
+
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _rate(func, count):
+    """调用count次func(i)，返回每秒调用次数"""
+    start = time.time()
+    for i in range(count):
+        func(i)
+    return count / (time.time() - start)
+
+
+def bench_image_storage(count=200, size=20 * 1024):
+    """
+    上传性能测试：对比每次新建鉴权对象和上传凭证、通过七牛SDK上传（改进前的storage）
+    与共用QiniuStorage客户端的上传速度，上传请求发送到本机的模拟服务，返回两种方式每秒的上传次数
+    """
+    from qiniu import Auth, Zone, put_data, config
+    from ihome.utils.image_storage import QiniuStorage, access_key, secret_key, bucket_name
+    data = "x" * size
+    with stub_http_server({"key": "stub", "hash": "stub"}, {"X-Reqid": "stub"}) as port:
+        up_host = "http://127.0.0.1:%s" % port
+
+        class StubZone(Zone):
+            """让七牛SDK的上传请求发送到模拟服务"""
+
+            def get_up_host(self, ak, bucket):
+                return [up_host]
+
+        def baseline_put_data(i):
+            token = Auth(access_key, secret_key).upload_token(bucket_name)
+            put_data(token, None, data)
+
+        default_zone = config.get_default("default_zone")
+        config.set_default(default_zone=StubZone())
+        try:
+            old_rate = _rate(baseline_put_data, count)
+        finally:
+            config.set_default(default_zone=default_zone)
+        client = QiniuStorage(access_key, secret_key, bucket_name, up_host=up_host)
+        new_rate = _rate(lambda i: client.put_data(data), count)
+    return old_rate, new_rate
+
+
+def _baseline_captcha_class():
+    """改进前的验证码渲染：每次生成都重新加载字体，字符以RGB图形渲染和变形，噪点逐个画线"""
+    import random
+    from PIL import Image
+    from PIL.ImageDraw import Draw
+    from PIL.ImageFont import truetype
+    from ihome.utils.captcha.captcha import Captcha
+
+    class BaselineCaptcha(Captcha):
+
+        def noise(self, image, number=50, level=2, color=None):
+            width, height = image.size
+            dx = width / 10
+            width -= dx
+            dy = height / 10
+            height -= dy
+            draw = Draw(image)
+            for i in xrange(number):
+                x = int(random.uniform(dx, width))
+                y = int(random.uniform(dy, height))
+                draw.line(((x, y), (x + level, y)), fill=color if color else self._color, width=level)
+            return image
+
+        def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None):
+            color = color if color else self._color
+            fonts = tuple([truetype(name, size)
+                           for name in fonts
+                           for size in font_sizes or (65, 70, 75)])
+            draw = Draw(image)
+            char_images = []
+            for c in self._text:
+                font = random.choice(fonts)
+                c_width, c_height = draw.textsize(c, font=font)
+                char_image = Image.new('RGB', (c_width, c_height), (0, 0, 0))
+                char_draw = Draw(char_image)
+                char_draw.text((0, 0), c, font=font, fill=color)
+                char_image = char_image.crop(char_image.getbbox())
+                for drawing in drawings:
+                    d = getattr(self, drawing)
+                    char_image = d(char_image)
+                char_images.append(char_image)
+            width, height = image.size
+            offset = int((width - sum(int(i.size[0] * squeeze_factor)
+                                      for i in char_images[:-1]) -
+                          char_images[-1].size[0]) / 2)
+            for char_image in char_images:
+                c_width, c_height = char_image.size
+                mask = char_image.convert('L').point(lambda i: i * 1.97)
+                image.paste(char_image,
+                            (offset, int((height - c_height) / 2)),
+                            mask)
+                offset += int(c_width * squeeze_factor)
+            return image
+
+    return BaselineCaptcha
+
+
+def bench_captcha(count=200):
+    """单进程（单核）连续生成count个验证码，对比改进前后的渲染，返回两种方式每秒生成的数量"""
+    from ihome.utils.captcha.captcha import Captcha
+    baseline = _baseline_captcha_class()()
+    captcha = Captcha()
+    old_rate = _rate(lambda i: baseline.generate_captcha(), count)
+    new_rate = _rate(lambda i: captcha.generate_captcha(), count)
+    return old_rate, new_rate
+
+
+def bench_captcha_token(count=1000):
+    """
+    比较两种模式下校验一次图片验证码使用的redis命令数和每秒校验次数，需要在app上下文中调用，返回{模式: (命令数, 每秒次数)}
+    redis模式：SETEX保存验证码，GET查询，DEL删除；令牌模式：签发和校验令牌都在本地完成，只有SET NX记录已使用的随机数
+    """
+    from ihome import redis_store, constants
+    from ihome.utils.captcha_token import make_captcha_token, check_captcha_token, TOKEN_OK
+    calls = [0]
+    execute_command = redis_store.execute_command
+
+    def counting_execute_command(*args, **kwargs):
+        calls[0] += 1
+        return execute_command(*args, **kwargs)
+
+    def check_in_redis(i):
+        key = "ImageCode_bench_%s" % i
+        redis_store.setex(key, constants.IMAGE_CODE_REDIS_EXPIRES, "ABCD")
+        assert redis_store.get(key).lower() == "abcd"
+        redis_store.delete(key)
+
+    def check_token(i):
+        token = make_captcha_token("bench_%s" % i, "ABCD")
+        assert check_captcha_token(token, "bench_%s" % i, "abcd") == TOKEN_OK
+
+    redis_store.execute_command = counting_execute_command
+    results = {}
+    try:
+        for mode, check in [("redis", check_in_redis), ("token", check_token)]:
+            calls[0] = 0
+            rate = _rate(check, count)
+            results[mode] = (calls[0] / float(count), rate)
+    finally:
+        del redis_store.execute_command
+    return results
+
+
+def bench_sms_client(count=500):
+    """向本机模拟云通讯接口的服务发送模板短信，返回每秒调用次数"""
+    from ihome.libs.yuntongxun.rest_client import CloopenClient
+    with stub_http_server({"statusCode": "000000", "templateSMS": {"smsMessageSid": "stub"}}) as port:
+        client = CloopenClient("sid", "token", "app", "127.0.0.1", port, "2013-12-26", scheme="http")
+        return _rate(lambda i: client.send_template_sms("13800000000", ["123456", 5], 1), count)
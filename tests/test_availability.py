@@ -0,0 +1,48 @@
+# -*- coding:utf-8 -*-
+
+import datetime
+import unittest
+
+from ihome import db
+from ihome.models import Order, HouseSearch
+from ihome.utils import availability
+from tests.base import AppTestCase
+
+
+class ConflictClauseTest(AppTestCase):
+    """预订日期索引不可用或冲突的房屋过多时，在数据库中排除与日期冲突的房屋"""
+
+    def setUp(self):
+        super(ConflictClauseTest, self).setUp()
+        landlord = self.make_user(1)
+        tenant = self.make_user(2)
+        area = self.make_area("area")
+        self.free = self.make_house(landlord, area, title="free", price=100)
+        self.booked = self.make_house(landlord, area, title="booked", price=100)
+        self.rejected = self.make_house(landlord, area, title="rejected", price=100)
+        for house, status in [(self.booked, "WAIT_ACCEPT"), (self.rejected, "REJECTED")]:
+            db.session.add(Order(user_id=tenant.id, house_id=house.id, begin_date=datetime.datetime(2017, 9, 1),
+                                 end_date=datetime.datetime(2017, 9, 3), days=3, house_price=100, amount=300,
+                                 status=status))
+        db.session.commit()
+        HouseSearch.rebuild()
+
+    def available_ids(self, start_date=None, end_date=None):
+        clause = availability.conflict_clause(HouseSearch.id, start_date, end_date)
+        return sorted(house_id for house_id, in db.session.query(HouseSearch.id).filter(~clause))
+
+    def test_overlapping_dates(self):
+        self.assertEqual(self.available_ids(datetime.datetime(2017, 9, 3), datetime.datetime(2017, 9, 5)),
+                         sorted([self.free.id, self.rejected.id]))
+
+    def test_dates_without_orders(self):
+        self.assertEqual(self.available_ids(datetime.datetime(2017, 9, 4), datetime.datetime(2017, 9, 5)),
+                         sorted([self.free.id, self.booked.id, self.rejected.id]))
+
+    def test_start_date_only(self):
+        self.assertEqual(self.available_ids(start_date=datetime.datetime(2017, 9, 2)),
+                         sorted([self.free.id, self.rejected.id]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# -*- coding:utf-8 -*-
+
+import unittest
+
+from redis import RedisError
+
+from ihome import create_app, redis_store
+from tests import benchmarks
+
+
+class BenchmarkTest(unittest.TestCase):
+    """使用较少的次数运行性能测试，检查能够正常运行并且改进后的实现更好"""
+
+    def test_house_detail(self):
+        results = benchmarks.bench_house_detail(count=2, latency=0)
+        # 改进前每条评论再查询一次评论用户，改进后的sql语句数与评论数无关
+        self.assertEqual(results["before"][1], results["after"][1] + 30)
+        self.assertEqual(results["after"][1], 5)
+
+    def test_image_storage(self):
+        old_rate, new_rate = benchmarks.bench_image_storage(count=3)
+        self.assertGreater(old_rate, 0)
+        self.assertGreater(new_rate, 0)
+
+    def test_captcha(self):
+        old_rate, new_rate = benchmarks.bench_captcha(count=3)
+        self.assertGreater(old_rate, 0)
+        self.assertGreater(new_rate, 0)
+
+    def test_captcha_token(self):
+        with create_app("testing").app_context():
+            try:
+                redis_store.ping()
+            except RedisError:
+                self.skipTest("redis is not available")
+            results = benchmarks.bench_captcha_token(count=3)
+        # 令牌模式只有SET NX一条redis命令
+        self.assertEqual(results["redis"][0], 3)
+        self.assertEqual(results["token"][0], 1)
+
+    def test_sms_client(self):
+        self.assertGreater(benchmarks.bench_sms_client(count=3), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
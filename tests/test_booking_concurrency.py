@@ -0,0 +1,26 @@
+# -*- coding:utf-8 -*-
+
+import unittest
+
+from ihome import db
+from tests import benchmarks
+from tests.base import AppTestCase
+
+
+class BookingConcurrencyTest(AppTestCase):
+    """
+    多个租客同时预订同一房屋的同一日期，不能出现重复预订
+    sqlite不支持SELECT ... FOR UPDATE，需要通过IHOME_TEST_DATABASE_URI指定mysql测试数据库才会运行
+    """
+
+    def test_no_double_booking(self):
+        if db.engine.dialect.name not in ("mysql", "postgresql"):
+            self.skipTest("%s does not honour SELECT ... FOR UPDATE" % db.engine.dialect.name)
+        rate, booked, order_count = benchmarks.bench_booking(self.app, thread_count=10, rounds=5)
+        print("%.1f booking requests/s" % rate)
+        self.assertEqual(booked, [1] * 5)
+        self.assertEqual(order_count, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
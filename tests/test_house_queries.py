@@ -0,0 +1,78 @@
+# -*- coding:utf-8 -*-
+
+import datetime
+import unittest
+
+from ihome import db
+from ihome.models import House, HouseImage, Facility, Order
+from tests.base import AppTestCase
+
+
+class HouseBasicDictListTest(AppTestCase):
+    """房屋列表批量序列化的查询次数"""
+
+    def _count_for(self, house_count):
+        """创建house_count个属于不同房东、不同区域的房屋，返回批量序列化执行的查询次数"""
+        houses = []
+        for i in range(house_count):
+            user = self.make_user(house_count * 100 + i)
+            area = self.make_area("area%s_%s" % (house_count, i))
+            houses.append(self.make_house(user, area, index_image_url="img%s" % i))
+        houses = House.query.filter(House.id.in_([house.id for house in houses])).all()
+        with self.count_queries() as statements:
+            house_list = House.to_basic_dict_list(houses)
+        self.assertEqual(len(house_list), house_count)
+        for house, house_dict in zip(houses, house_list):
+            self.assertEqual(house_dict["house_id"], house.id)
+            self.assertEqual(house_dict["area_name"], "area%s_%s" % (house_count, houses.index(house)))
+        db.session.expunge_all()
+        return len(statements)
+
+    def test_query_count_independent_of_page_size(self):
+        # 区域名字和房东头像各一次查询，与房屋数量无关
+        self.assertEqual(self._count_for(2), 2)
+        self.assertEqual(self._count_for(10), 2)
+
+    def test_empty_list_runs_no_query(self):
+        with self.count_queries() as statements:
+            self.assertEqual(House.to_basic_dict_list([]), [])
+        self.assertEqual(statements, [])
+
+
+class HouseFullDictTest(AppTestCase):
+    """房屋详情序列化的查询次数"""
+
+    def _count_for(self, item_count):
+        """创建带有item_count张图片、item_count个设施、item_count条评论的房屋，返回详情序列化执行的查询次数"""
+        landlord = self.make_user(item_count * 100)
+        area = self.make_area("area%s" % item_count)
+        house = self.make_house(landlord, area)
+        for i in range(item_count):
+            facility = Facility(name="facility%s_%s" % (item_count, i))
+            db.session.add(facility)
+            house.facilities.append(facility)
+            db.session.add(HouseImage(house_id=house.id, url="image%s" % i))
+            tenant = self.make_user(item_count * 100 + i + 1)
+            day = datetime.datetime(2017, 9, 1) + datetime.timedelta(days=i)
+            db.session.add(Order(user_id=tenant.id, house_id=house.id, begin_date=day, end_date=day, days=1,
+                                 house_price=100, amount=100, status="COMPLETE", comment="comment%s" % i))
+        db.session.commit()
+        house_id = house.id
+        db.session.expunge_all()
+        house = House.query.get(house_id)
+        with self.count_queries() as statements:
+            house_dict = house.to_full_dict()
+        self.assertEqual(len(house_dict["img_urls"]), item_count)
+        self.assertEqual(len(house_dict["facilities"]), item_count)
+        self.assertEqual(len(house_dict["comments"]), item_count)
+        db.session.expunge_all()
+        return len(statements)
+
+    def test_query_count_independent_of_related_rows(self):
+        # 房东、图片、设施、评论各一次查询，与图片、设施、评论的数量无关
+        self.assertEqual(self._count_for(1), 4)
+        self.assertEqual(self._count_for(8), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+# -*- coding:utf-8 -*-
+
+import unittest
+
+from ihome import db
+from ihome.models import HouseSearch
+from tests.base import AppTestCase
+
+
+class HouseSearchRebuildTest(AppTestCase):
+    """重建房屋搜索表"""
+
+    def test_rebuild_updates_in_place(self):
+        landlord = self.make_user(1)
+        area = self.make_area("area")
+        kept = self.make_house(landlord, area, title="kept", price=100)
+        added = self.make_house(landlord, area, title="added", price=200)
+        # 搜索表中有过期的数据、缺少的房屋以及已删除的房屋
+        db.session.add(HouseSearch(id=kept.id, user_id=landlord.id, area_id=area.id, area_name="old", title="old"))
+        db.session.add(HouseSearch(id=added.id + 100, user_id=landlord.id, area_id=area.id, area_name="x", title="x"))
+        db.session.commit()
+
+        self.assertEqual(HouseSearch.rebuild(), 2)
+
+        rows = dict((row.id, row) for row in HouseSearch.query.all())
+        self.assertEqual(sorted(rows), sorted([kept.id, added.id]))
+        self.assertEqual(rows[kept.id].title, "kept")
+        self.assertEqual(rows[kept.id].area_name, "area")
+        self.assertEqual(rows[kept.id].user_avatar_url, landlord.avatar_url)
+        self.assertEqual(rows[added.id].price, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
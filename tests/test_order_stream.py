@@ -0,0 +1,41 @@
+# -*- coding:utf-8 -*-
+
+import os
+import unittest
+
+from ihome.utils import order_stream
+
+
+class OrderStreamTest(unittest.TestCase):
+    """订单推送连接"""
+
+    def setUp(self):
+        # 不启动订阅推送频道的后台线程
+        order_stream._listener_pid = os.getpid()
+
+    def tearDown(self):
+        order_stream._listener_pid = None
+        order_stream._streams.clear()
+
+    def test_close_registers_and_removes_queue(self):
+        stream = order_stream.stream("custom", 1)
+        next(stream)
+        channel = order_stream.ORDER_STREAM_CHANNEL % ("custom", 1)
+        self.assertEqual(len(order_stream._streams[channel]), 1)
+        stream.close()
+        self.assertNotIn(channel, order_stream._streams)
+
+    def test_close_after_channel_removed(self):
+        stream = order_stream.stream("landlord", 1)
+        next(stream)
+        order_stream._streams.clear()
+        stream.close()
+        self.assertEqual(order_stream._streams, {})
+
+    def test_not_cooperative_without_gevent(self):
+        # 测试进程没有使用gevent替换socket
+        self.assertFalse(order_stream.cooperative())
+
+
+if __name__ == "__main__":
+    unittest.main()
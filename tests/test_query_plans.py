@@ -0,0 +1,79 @@
+# -*- coding:utf-8 -*-
+
+import datetime
+import unittest
+
+from ihome import db
+from ihome.models import House, Order, HouseSearch
+from ihome.utils import availability
+from tests.base import AppTestCase
+
+
+class QueryPlanTest(AppTestCase):
+    """热点查询的执行计划使用对应的索引，不进行全表扫描"""
+
+    def explain(self, query):
+        """返回查询在sqlite中的执行计划，每一步一行"""
+        compiled = query.statement.compile(dialect=db.engine.dialect)
+        params = [compiled.params[name] for name in compiled.positiontup]
+        cursor = db.session.connection().connection.cursor()
+        cursor.execute("EXPLAIN QUERY PLAN " + unicode(compiled), params)
+        return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, query, table, index):
+        plan = self.explain(query)
+        steps = [step for step in plan if (" %s " % table) in (step + " ")]
+        self.assertTrue(steps, plan)
+        for step in steps:
+            self.assertIn("USING", step, plan)
+            self.assertIn(index, step, plan)
+
+    def test_tenant_order_list(self):
+        query = Order.query.filter(Order.user_id == 1).order_by(Order.create_time.desc(), Order.id.desc())
+        self.assertUsesIndex(query, "ih_order_info", "ix_ih_order_info_user_id_ctime")
+
+    def test_landlord_order_list(self):
+        # 房东的房屋通过ih_house_info.user_id外键查询，mysql自动为外键建立索引，sqlite中只检查订单表
+        query = db.session.query(Order.id, Order.create_time, House.title)\
+            .join(House, Order.house_id == House.id).filter(House.user_id == 1)\
+            .order_by(Order.create_time.desc(), Order.id.desc())
+        self.assertUsesIndex(query, "ih_order_info", "ix_ih_order_info_house_id_ctime")
+
+    def test_booking_conflict_check(self):
+        day = datetime.datetime(2017, 9, 1)
+        query = Order.query.filter(Order.house_id == 1, Order.begin_date <= day, Order.end_date >= day,
+                                   Order.status.notin_(("REJECTED", "CANCELED")))
+        self.assertUsesIndex(query, "ih_order_info", "ix_ih_order_info_house_id_dates")
+
+    def test_house_detail_comments(self):
+        query = db.session.query(Order.comment)\
+            .filter(Order.house_id == 1, Order.status == "COMPLETE", Order.comment != None)\
+            .order_by(Order.update_time.desc())
+        self.assertUsesIndex(query, "ih_order_info", "ix_ih_order_info_house_id_status_utime")
+
+    def test_house_list_in_area(self):
+        for column, index in [(HouseSearch.create_time, "ix_ih_house_search_area_id_ctime"),
+                              (HouseSearch.price, "ix_ih_house_search_area_id_price"),
+                              (HouseSearch.order_count, "ix_ih_house_search_area_id_order_count")]:
+            query = HouseSearch.query.filter(HouseSearch.area_id == 1).order_by(column.desc(), HouseSearch.id.desc())
+            self.assertUsesIndex(query, "ih_house_search", index)
+
+    def test_house_list_all_areas(self):
+        for column, index in [(HouseSearch.create_time, "ix_ih_house_search_ctime"),
+                              (HouseSearch.price, "ix_ih_house_search_price"),
+                              (HouseSearch.order_count, "ix_ih_house_search_order_count")]:
+            query = HouseSearch.query.order_by(column.desc(), HouseSearch.id.desc())
+            self.assertUsesIndex(query, "ih_house_search", index)
+
+    def test_house_list_date_filter(self):
+        # 日期冲突的房屋在订单表中逐个房屋检查，不传递房屋编号列表
+        clause = availability.conflict_clause(HouseSearch.id, datetime.datetime(2017, 9, 1),
+                                              datetime.datetime(2017, 9, 3))
+        query = HouseSearch.query.filter(HouseSearch.area_id == 1, ~clause)\
+            .order_by(HouseSearch.create_time.desc(), HouseSearch.id.desc())
+        self.assertUsesIndex(query, "ih_order_info", "ix_ih_order_info_house_id_dates")
+        self.assertUsesIndex(query, "ih_house_search", "ix_ih_house_search_area_id_ctime")
+
+
+if __name__ == "__main__":
+    unittest.main()